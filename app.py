@@ -1,57 +1,53 @@
-import base64
-import io
 import time
+import uuid
 
-import cv2
 import streamlit as st
-from PIL import Image
+import streamlit.components.v1 as components
 
 try:
     from streamlit_extras.badges import badge
 except ImportError:
     badge = None
 
-from config import SUIT_BGR
-from detection import compute_card_states, load_model
+from config import METRICS_OVERLAY, MJPEG_PORT, MJPEG_PUBLIC_URL, SHOW_PIPELINE_STATS
+from card_tracker import CardTracker
+from detection import load_card_sprites
+from engine import DetectionEngine
+from statesync import client_html
 from renderer import (
+    render_camera_frame,
     render_card_sum,
     render_info_panel,
     render_progress_bar,
     render_suit_icons,
     render_suit_images,
 )
-from styles import PAGE_CSS, SUIT_DIVIDER
+from styles import CSS_GLOW, PAGE_CSS, SUIT_DIVIDER
 
-# Module-level camera variable — keeps cv2.VideoCapture out of
-# st.session_state so Streamlit's hot-reload doesn't segfault.
-_camera = {"cap": None}
 
+@st.cache_resource
+def _get_engine():
+    # One engine per process: every session renders the same inference
+    # output, and the engine lives on across reruns
+    return DetectionEngine()
 
-def _get_camera():
-    if _camera["cap"] is None or not _camera["cap"].isOpened():
-        cap = cv2.VideoCapture(0)
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-        _camera["cap"] = cap
-    return _camera["cap"]
 
+def _live_url(path):
+    # Endpoint on the engine's HTTP server (MJPEG feed, state-sync events)
+    if MJPEG_PUBLIC_URL:
+        return MJPEG_PUBLIC_URL.rsplit("/", 1)[0] + path
+    # Same host the browser used to reach Streamlit, so remote viewers work
+    host = st.context.headers.get("Host", "localhost").split(":")[0]
+    return f"http://{host}:{MJPEG_PORT}{path}"
 
-def _release_camera():
-    if _camera["cap"] is not None:
-        _camera["cap"].release()
-        _camera["cap"] = None
 
-
-def frame_to_base64(frame_rgb):
-    pil_image = Image.fromarray(frame_rgb)
-    buffer = io.BytesIO()
-    pil_image.save(buffer, format="JPEG", quality=85)
-    img_str = base64.b64encode(buffer.getvalue()).decode()
-    return img_str
+def _mjpeg_url():
+    return MJPEG_PUBLIC_URL or _live_url("/stream.mjpg")
 
 st.set_page_config(layout="wide", page_title="Card Detection")
-st.markdown(PAGE_CSS, unsafe_allow_html=True)
+st.markdown(PAGE_CSS + CSS_GLOW, unsafe_allow_html=True)
+# Card art for Images mode is sent once here as a sprite sheet
+st.markdown(load_card_sprites(), unsafe_allow_html=True)
 
 # Modern header (shadcn/TailwindUI-inspired)
 header_html = """
@@ -100,8 +96,8 @@ with center_col:
             if st.session_state.cached_icons_html["left"]:
                 left_placeholder.markdown(st.session_state.cached_icons_html["left"], unsafe_allow_html=True)
                 right_placeholder.markdown(st.session_state.cached_icons_html["right"], unsafe_allow_html=True)
-            elif st.session_state.last_card_states:
-                update_side_panels(st.session_state.last_card_states)
+            else:
+                update_side_panels(st.session_state.card_tracker)
 
     def set_images():
         if st.session_state.card_style != "Images":
@@ -111,8 +107,8 @@ with center_col:
             if st.session_state.cached_images_html["left"]:
                 left_placeholder.markdown(st.session_state.cached_images_html["left"], unsafe_allow_html=True)
                 right_placeholder.markdown(st.session_state.cached_images_html["right"], unsafe_allow_html=True)
-            elif st.session_state.last_card_states:
-                update_side_panels(st.session_state.last_card_states)
+            else:
+                update_side_panels(st.session_state.card_tracker)
 
     # Add spacing to prevent overlay
     st.markdown("<div style='margin-top:8px;'></div>", unsafe_allow_html=True)
@@ -150,26 +146,49 @@ with center_col:
     status_text = "Running" if st.session_state.running else "Idle"
     icon = "⚡" if st.session_state.running else "⏸"
     st.caption(f"{icon} {status_text}")
+    stats_placeholder = st.empty()
 
 # --- Session state ---
-if "card_history" not in st.session_state:
-    st.session_state.card_history = {}
-if "ever_detected" not in st.session_state:
-    st.session_state.ever_detected = set()
+if "card_tracker" not in st.session_state:
+    st.session_state.card_tracker = CardTracker()
 if "last_frame_html" not in st.session_state:
     st.session_state.last_frame_html = None
-if "last_card_states" not in st.session_state:
-    st.session_state.last_card_states = {}
 if "cached_icons_html" not in st.session_state:
     st.session_state.cached_icons_html = {"left": "", "right": ""}
 if "cached_images_html" not in st.session_state:
     st.session_state.cached_images_html = {"left": "", "right": ""}
 
 
-def update_side_panels(card_states):
+if "viewer_id" not in st.session_state:
+    st.session_state.viewer_id = uuid.uuid4().hex
+
+engine = _get_engine()
+# Load and warm the model in the background while the page sits idle
+engine.warm_up()
+metrics = engine.metrics
+if engine.sync is not None:
+    # State sync: the engine keeps the one table state every viewer shows
+    st.session_state.card_tracker = engine.cards
+
+# Hash of the HTML last sent to each placeholder during this script run.
+# Placeholders are only rewritten when their content actually changed.
+_sent_hashes = {}
+
+
+def _write(placeholder, html, name):
+    digest = hash(html)
+    if _sent_hashes.get(placeholder) == digest:
+        return
+    _sent_hashes[placeholder] = digest
+    with metrics.span(f"write_{name}"):
+        placeholder.markdown(html, unsafe_allow_html=True)
+
+
+def update_side_panels(cards):
     render = render_suit_images if st.session_state.card_style == "Images" else render_suit_icons
-    left_html = render("C", card_states) + SUIT_DIVIDER + render("S", card_states)
-    right_html = render("H", card_states) + SUIT_DIVIDER + render("D", card_states)
+    with metrics.span("render_panels"):
+        left_html = render("C", cards) + SUIT_DIVIDER + render("S", cards)
+        right_html = render("H", cards) + SUIT_DIVIDER + render("D", cards)
     
     # Cache the HTML for both modes to enable instant switching
     if st.session_state.card_style == "Icons":
@@ -178,92 +197,107 @@ def update_side_panels(card_states):
         st.session_state.cached_images_html = {"left": left_html, "right": right_html}
     
     # Update side panels - this should not cause frame refresh
-    left_placeholder.markdown(left_html, unsafe_allow_html=True)
-    right_placeholder.markdown(right_html, unsafe_allow_html=True)
+    _write(left_placeholder, left_html, "left")
+    _write(right_placeholder, right_html, "right")
     
     # Clear switching flag after update
     if st.session_state.get("switching_mode", False):
         st.session_state.switching_mode = False
 
 
-# Show cards and progress bar in default state (only if not already initialized)
+# Show cards and progress bar from the last known state
 # Skip initial update if we're switching modes to prevent refresh
+cards = st.session_state.card_tracker
 if not st.session_state.get("switching_mode", False):
-    if not st.session_state.last_card_states:
-        update_side_panels({})
-        progress_placeholder.markdown(render_progress_bar(is_running=False), unsafe_allow_html=True)
-    else:
-        # Use last known states to avoid refresh
-        update_side_panels(st.session_state.last_card_states)
-        if not st.session_state.running:
-            progress_placeholder.markdown(render_progress_bar(st.session_state.last_card_states, is_running=False), unsafe_allow_html=True)
+    update_side_panels(cards)
+    if not st.session_state.running or not cards.seen_count():
+        progress_placeholder.markdown(render_progress_bar(cards, is_running=False), unsafe_allow_html=True)
 
 # --- Main camera and detection loop ---
 if st.session_state.running:
-    cap = _get_camera()
-
-    if cap is not None and cap.isOpened():
-        # Detection mode - continuous loop
-        model = load_model()
-        
-        while st.session_state.running:
-            ret, frame = cap.read()
-            if not ret:
-                st.warning("Lost webcam feed.")
-                break
-
-            results = model(frame, imgsz=320, conf=0.85, verbose=False)
-            now = time.time()
-
-            current_detections = {}
-            for box in results[0].boxes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                cls_id = int(box.cls[0])
-                name = model.names[cls_id]
-                conf = float(box.conf[0])
-                label = f"{name} ({int(conf * 100)}%)"
-
-                if name not in current_detections or conf > current_detections[name]:
-                    current_detections[name] = conf
-
-                box_color = SUIT_BGR.get(name[-1], (0, 255, 0))
-                cv2.rectangle(frame, (x1, y1), (x2, y2), box_color, 2)
-                cv2.putText(frame, label, (x1, y1 - 10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, box_color, 2)
-
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            img_str = frame_to_base64(frame_rgb)
-            frame_html = f'''
+    if engine.subscribe(st.session_state.viewer_id):
+        metrics_placeholder = st.sidebar.empty() if metrics.enabled and METRICS_OVERLAY == "sidebar" else None
+        overlay_due = 0.0
+
+        if engine.mjpeg is not None:
+            # The stream is embedded once; frames reach the browser as raw
+            # JPEG bytes over the MJPEG endpoint, not through Streamlit.
+            st.session_state.last_frame_html = f'''
             <div class="camera-container">
-                <img src="data:image/jpeg;base64,{img_str}" alt="Camera feed" />
+                <img src="{_mjpeg_url()}" alt="Camera feed" />
             </div>
             '''
-            # Store frame in session state to persist across reruns
-            st.session_state.last_frame_html = frame_html
-            
-            # Only update frame if not switching modes (to prevent refresh)
-            if not st.session_state.get("switching_mode", False):
-                frame_placeholder.markdown(frame_html, unsafe_allow_html=True)
-            elif st.session_state.last_frame_html:
-                # Keep showing last frame during mode switch
-                frame_placeholder.markdown(st.session_state.last_frame_html, unsafe_allow_html=True)
-
-            card_states = compute_card_states(current_detections, now)
-            st.session_state.last_card_states = card_states
-            
-            # Only update if not switching modes (to prevent refresh)
-            if not st.session_state.get("switching_mode", False):
-                update_side_panels(card_states)
-                progress_placeholder.markdown(render_progress_bar(card_states, is_running=True), unsafe_allow_html=True)
-                sum_placeholder.markdown(render_card_sum(current_detections), unsafe_allow_html=True)
+            frame_placeholder.markdown(st.session_state.last_frame_html, unsafe_allow_html=True)
+
+        if engine.sync is not None:
+            # Panels, progress and sum are written once here; from then on
+            # the browser patches them from the engine's card-state deltas
+            _write(progress_placeholder, render_progress_bar(cards, is_running=True), "progress")
+            _write(sum_placeholder, render_card_sum({}), "sum")
+            style = st.session_state.card_style.lower()
+            components.html(client_html(_live_url(f"/events?style={style}")), height=0)
+
+        # The shared engine captures, infers and encodes; this loop only
+        # renders the newest frame it published.
+        last_seq = 0
+        while st.session_state.running:
+            item = engine.wait(st.session_state.viewer_id, last_seq, timeout=1.0)
+            if item is None:
+                if engine.error is not None:
+                    st.error(engine.error)
+                    break
+                if not engine.running:
+                    # Our lease lapsed (e.g. the tab was stalled); take it again
+                    engine.subscribe(st.session_state.viewer_id)
+                continue
+            last_seq = item["seq"]
+
+            now = item["t"]
+            current_detections = item["detections"]
+            if item["img_str"] is not None:
+                frame_html = render_camera_frame(item["img_str"], item["overlay"])
+                # Store frame in session state to persist across reruns
+                st.session_state.last_frame_html = frame_html
+
+                # Only update frame if not switching modes (to prevent refresh)
+                if not st.session_state.get("switching_mode", False):
+                    with metrics.span("write_frame"):
+                        frame_placeholder.markdown(frame_html, unsafe_allow_html=True)
+                elif st.session_state.last_frame_html:
+                    # Keep showing last frame during mode switch
+                    frame_placeholder.markdown(st.session_state.last_frame_html, unsafe_allow_html=True)
+
+            if engine.sync is not None:
+                # The engine updated the shared state; the browser patches
+                # the panels from its deltas
+                if st.session_state.get("switching_mode", False):
+                    update_side_panels(cards)
             else:
-                # Update panels but skip progress bar during mode switch
-                update_side_panels(card_states)
+                with metrics.span("state_update"):
+                    cards.update(current_detections, now)
+
+                # Only update if not switching modes (to prevent refresh)
+                if not st.session_state.get("switching_mode", False):
+                    # Panels only change when some card's rendered state did
+                    if cards.changed:
+                        update_side_panels(cards)
+                    _write(progress_placeholder, render_progress_bar(cards, is_running=True), "progress")
+                    _write(sum_placeholder, render_card_sum(current_detections), "sum")
+                else:
+                    # Update panels but skip progress bar during mode switch
+                    update_side_panels(cards)
+
+            if metrics_placeholder is not None and time.monotonic() >= overlay_due:
+                overlay_due = time.monotonic() + 0.5
+                metrics_placeholder.text("\n".join(metrics.lines()))
+
+            if SHOW_PIPELINE_STATS:
+                stats_placeholder.caption(engine.describe())
     else:
-        st.error("Could not open webcam.")
+        st.error(engine.error)
 else:
-    # Stopped — release camera if still open
-    _release_camera()
+    # Stopped — the engine releases the camera when no viewer is left
+    engine.unsubscribe(st.session_state.viewer_id)
 
     # Show loading screen
     loading_html = '''
@@ -276,10 +310,10 @@ else:
     '''
     frame_placeholder.markdown(loading_html, unsafe_allow_html=True)
     sum_placeholder.markdown(render_card_sum({}), unsafe_allow_html=True)
-    progress_placeholder.markdown(render_progress_bar(is_running=False), unsafe_allow_html=True)
+    progress_placeholder.markdown(render_progress_bar(cards, is_running=False), unsafe_allow_html=True)
 
     # Update side panels so Icons/Images switching works while stopped
-    update_side_panels(st.session_state.get("last_card_states", {}) or {})
+    update_side_panels(cards)
 
 # Footer
 st.markdown(
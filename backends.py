@@ -0,0 +1,206 @@
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import time
+
+from config import (
+    EXPORT_DYNAMIC, INFER_CONF, INFER_IMGSZ, INFERENCE_BACKEND, MODEL_PATH, RUNTIME_PROFILE_PATH,
+)
+
+# backend name -> (ultralytics export format, runtime module it needs)
+BACKENDS = {
+    "pytorch": (None, "torch"),
+    "onnx": ("onnx", "onnxruntime"),
+    "openvino": ("openvino", "openvino"),
+    "onnx-int8": (None, "onnxruntime"),  # built by quantize.py, not exported on demand
+}
+
+
+def available_backends():
+    return [name for name, (_, module) in BACKENDS.items() if importlib.util.find_spec(module)]
+
+
+def exported_path(backend, model_path=MODEL_PATH):
+    stem = os.path.splitext(model_path)[0]
+    if backend == "onnx":
+        return stem + ".onnx"
+    if backend == "openvino":
+        return stem + "_openvino_model"
+    if backend == "onnx-int8":
+        return stem + "_int8.onnx"
+    return model_path
+
+
+def _is_fresh(path, model_path):
+    return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(model_path)
+
+
+def export_model(backend, model_path=MODEL_PATH, imgsz=INFER_IMGSZ, force=False):
+    # Exports next to the .pt and reuses the artifact until the .pt changes
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+    path = exported_path(backend, model_path)
+    if backend == "pytorch" or (not force and _is_fresh(path, model_path)):
+        return path
+    if backend == "onnx-int8":
+        raise FileNotFoundError(f"{path} is missing or older than {model_path}; run: python quantize.py")
+
+    from ultralytics import YOLO
+
+    # dynamic shapes keep batch mode and non-default imgsz working
+    return YOLO(model_path).export(format=BACKENDS[backend][0], imgsz=imgsz,
+                                   dynamic=EXPORT_DYNAMIC, verbose=False)
+
+
+def load_profile(path=RUNTIME_PROFILE_PATH, model_path=MODEL_PATH):
+    # The runtime profile written by tune.py, or None when there is none, it
+    # was tuned for a different model file, or its backend can't run here
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if os.path.exists(model_path) and profile.get("model_mtime") != os.path.getmtime(model_path):
+        print(f"Ignoring {path}: tuned for an older {os.path.basename(model_path)}; re-run tune.py",
+              file=sys.stderr)
+        return None
+    if profile.get("backend") not in available_backends():
+        return None
+    return profile
+
+
+def apply_profile(model, profile, backend):
+    # Thread count is process-wide, half becomes the model's default, the
+    # tuned imgsz is kept on the model for model_imgsz() and fusion is
+    # applied in place.
+    if profile.get("threads") and backend == "pytorch":
+        import torch
+
+        torch.set_num_threads(profile["threads"])
+    if profile.get("fuse") and backend == "pytorch":
+        model.fuse()
+    model.cardcv_imgsz = profile["imgsz"]
+    if profile.get("half"):
+        model.overrides["half"] = True
+    return model
+
+
+def model_imgsz(model):
+    # The tuned imgsz when a runtime profile was applied, else INFER_IMGSZ.
+    # Not overrides["imgsz"]: ultralytics fills that with the checkpoint's
+    # training size.
+    return getattr(model, "cardcv_imgsz", None) or INFER_IMGSZ
+
+
+def load_backend(backend=None, model_path=MODEL_PATH, profile_path=RUNTIME_PROFILE_PATH):
+    # Every backend is wrapped in ultralytics' YOLO, so callers keep the same
+    # API: model(frames, imgsz=..., conf=...) -> results, and model.names.
+    #
+    # backend=None picks the tuned backend from the runtime profile (else
+    # INFERENCE_BACKEND). The profile is applied when its backend is the one
+    # being loaded; profile_path=None loads library defaults.
+    profile = load_profile(profile_path, model_path) if profile_path else None
+    if backend is None:
+        backend = profile["backend"] if profile else INFERENCE_BACKEND
+    if profile and profile["backend"] != backend:
+        profile = None
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+    module = BACKENDS[backend][1]
+    if not importlib.util.find_spec(module):
+        raise ImportError(f"Backend {backend!r} needs the {module!r} package")
+
+    from ultralytics import YOLO
+
+    if backend == "pytorch":
+        model = YOLO(model_path)
+    else:
+        model = YOLO(export_model(backend, model_path), task="detect")
+    if profile:
+        apply_profile(model, profile, backend)
+    return model
+
+
+def warm_up(model, imgsz=None):
+    # One dummy inference, so the first real frame doesn't pay for lazy
+    # initialization (and graph compilation on exported backends)
+    import numpy as np
+
+    imgsz = imgsz or model_imgsz(model)
+    model(np.zeros((imgsz, imgsz, 3), np.uint8), imgsz=imgsz, verbose=False)
+    return model
+
+
+def check_parity(backend, frames, imgsz=INFER_IMGSZ, conf=INFER_CONF, iou_threshold=0.5,
+                 conf_tolerance=0.05, model_path=MODEL_PATH):
+    # Runs frames through PyTorch and `backend`; fails if any reference box
+    # is missing, an extra box appears, or a confidence differs by more
+    # than conf_tolerance.
+    from postprocess import Detections, agreement
+
+    reference = load_backend("pytorch", model_path, profile_path=None)
+    candidate = load_backend(backend, model_path, profile_path=None)
+    totals = {"frames": 0, "reference": 0, "other": 0, "matched": 0, "max_conf_diff": 0.0}
+    timings = {"pytorch": 0.0, backend: 0.0}
+
+    for frame in frames:
+        start = time.perf_counter()
+        ref = Detections.from_result(reference(frame, imgsz=imgsz, conf=conf, verbose=False)[0])
+        timings["pytorch"] += time.perf_counter() - start
+        start = time.perf_counter()
+        out = Detections.from_result(candidate(frame, imgsz=imgsz, conf=conf, verbose=False)[0])
+        timings[backend] += time.perf_counter() - start
+
+        result = agreement(ref, out, iou_threshold)
+        totals["frames"] += 1
+        for key in ("reference", "other", "matched"):
+            totals[key] += result[key]
+        totals["max_conf_diff"] = max(totals["max_conf_diff"], result["max_conf_diff"])
+
+    n = max(totals["frames"], 1)
+    totals["ms_per_frame"] = {name: t / n * 1000 for name, t in timings.items()}
+    totals["ok"] = (
+        totals["matched"] == totals["reference"] == totals["other"]
+        and totals["max_conf_diff"] <= conf_tolerance
+    )
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export and check inference backends.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="export playingCards.pt for a backend")
+    export.add_argument("backend", choices=[b for b, (fmt, _) in BACKENDS.items() if fmt])
+    export.add_argument("--force", action="store_true", help="re-export even if cached")
+
+    parity = sub.add_parser("parity", help="compare a backend's detections with PyTorch")
+    parity.add_argument("backend", choices=[b for b in BACKENDS if b != "pytorch"])
+    parity.add_argument("--frames", type=int, default=50, help="synthetic frames (default: 50)")
+    parity.add_argument("--conf-tolerance", type=float, default=0.05)
+
+    sub.add_parser("list", help="show which backends can run here")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for name in BACKENDS:
+            status = "available" if name in available_backends() else "missing runtime"
+            print(f"{name:<10} {status}")
+    elif args.command == "export":
+        print(export_model(args.backend, force=args.force))
+    else:
+        from synthetic import make_scenes
+
+        frames = [frame for frame, _ in make_scenes(args.frames)]
+        result = check_parity(args.backend, frames, conf_tolerance=args.conf_tolerance)
+        for key, value in result.items():
+            print(f"{key}: {value}")
+        sys.exit(0 if result["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
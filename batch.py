@@ -0,0 +1,106 @@
+import csv
+import json
+import queue
+import threading
+import time
+
+from backends import model_imgsz
+from config import INFER_CONF
+from postprocess import Detections
+from sources import open_source
+
+_END = object()
+
+
+def iter_frames(source):
+    # Yields (frame_name, frame_bgr) from a video file or an image directory,
+    # as fast as they decode. Frames are fresh arrays (no ring) because the
+    # prefetch queue keeps many of them alive at once.
+    src = open_source(source, realtime=False, ring_size=0)
+    if not src.isOpened():
+        raise IOError(f"Could not open source: {source}")
+    try:
+        yield from src
+    finally:
+        src.release()
+
+
+def prefetch(iterable, depth=64):
+    # Decodes ahead on a background thread. The queue is bounded so a slow
+    # consumer applies backpressure instead of buffering the whole input.
+    q = queue.Queue(maxsize=depth)
+    errors = []
+
+    def reader():
+        try:
+            for item in iterable:
+                q.put(item)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            q.put(_END)
+
+    threading.Thread(target=reader, name="batch-reader", daemon=True).start()
+    while True:
+        item = q.get()
+        if item is _END:
+            break
+        yield item
+    if errors:
+        raise errors[0]
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class DetectionWriter:
+    # JSONL: one line per frame. CSV: one row per detection.
+    CSV_FIELDS = ["frame", "card", "conf", "x1", "y1", "x2", "y2"]
+
+    def __init__(self, path):
+        self.path = path
+        self.format = "csv" if path.lower().endswith(".csv") else "jsonl"
+        self._file = open(path, "w", newline="")
+        self._csv = None
+        if self.format == "csv":
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(self.CSV_FIELDS)
+
+    def write(self, frame_name, detections):
+        if self._csv is not None:
+            for d in detections:
+                self._csv.writerow([frame_name, d["card"], f"{d['conf']:.4f}", *d["box"]])
+        else:
+            self._file.write(json.dumps({"frame": frame_name, "detections": detections}) + "\n")
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def run_batch(model, source, out_path, batch_size=8, imgsz=None, conf=INFER_CONF, prefetch_depth=64):
+    imgsz = imgsz or model_imgsz(model)
+    frames = 0
+    start = time.perf_counter()
+    with DetectionWriter(out_path) as writer:
+        for batch in batched(prefetch(iter_frames(source), prefetch_depth), batch_size):
+            names = [name for name, _ in batch]
+            results = model([frame for _, frame in batch], imgsz=imgsz, conf=conf, verbose=False)
+            for frame_name, result in zip(names, results):
+                writer.write(frame_name, Detections.from_result(result, model.names).to_records())
+            frames += len(batch)
+    elapsed = time.perf_counter() - start
+    return frames, elapsed
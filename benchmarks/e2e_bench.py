@@ -0,0 +1,182 @@
+# Camera-free end-to-end benchmark. Synthetic scenes built from assets/cards
+# go through every stage the app runs per frame; per-stage and end-to-end
+# latency percentiles are printed and can be saved as a JSON baseline.
+#
+#   python -m benchmarks.e2e_bench --save baseline.json
+#   python -m benchmarks.e2e_bench --check baseline.json --threshold 1.25
+#
+# --no-model replaces inference with the scenes' ground truth, for machines
+# without the model weights.
+import argparse
+import json
+import logging
+import platform
+import sys
+import time
+
+import numpy as np
+
+from card_tracker import CardTracker
+from backends import model_imgsz
+from config import CARD_IDS, INFER_CONF, SUITS
+from detection import load_model
+from encoder import FrameEncoder
+from postprocess import Detections
+from preview import Preview
+from renderer import render_card_sum, render_progress_bar, render_suit_icons, render_suit_images
+from synthetic import make_scenes
+
+STAGES = [
+    "inference", "parse", "preview", "card_states", "render_icons", "render_images",
+    "progress_bar", "card_sum", "encode",
+]
+
+
+class _Boxes:
+    def __init__(self, data):
+        self.data = data
+
+
+class _TruthResult:
+    # Result-shaped wrapper around ground truth, for --no-model runs
+    def __init__(self, truth):
+        self.names = dict(enumerate(CARD_IDS))
+        rows = [[*box, 0.95, CARD_IDS.index(card_id)] for card_id, box in truth]
+        self.boxes = _Boxes(np.array(rows, np.float32).reshape(-1, 6))
+
+
+def percentiles(samples):
+    ms = np.asarray(samples) * 1000
+    return {
+        "p50": float(np.percentile(ms, 50)),
+        "p95": float(np.percentile(ms, 95)),
+        "p99": float(np.percentile(ms, 99)),
+        "mean": float(ms.mean()),
+    }
+
+
+def run(frames, scenes, hold, use_model, warmup=5):
+    model = load_model() if use_model else None
+    imgsz = model_imgsz(model) if use_model else None
+    encoder = FrameEncoder(budget_ms=None)
+    preview = Preview(encoder)
+    sequence = make_scenes(scenes, seed=0)
+
+    cards = CardTracker()
+
+    timings = {stage: [] for stage in STAGES + ["end_to_end"]}
+    for i in range(frames + warmup):
+        # Each scene stays on the table for `hold` frames at 30 FPS, so cards
+        # pop, hold and fade like they do live
+        frame, truth = sequence[(i // hold) % len(sequence)]
+        frame = frame.copy()
+        now = i / 30.0
+        t = {}
+
+        start = time.perf_counter()
+        if model is not None:
+            result = model(frame, imgsz=imgsz, conf=INFER_CONF, verbose=False)[0]
+        else:
+            result = _TruthResult(truth)
+        t["inference"] = time.perf_counter()
+
+        detections = Detections.from_result(result)
+        current_detections = detections.best_per_card()
+        t["parse"] = time.perf_counter()
+
+        shown = preview.render(frame, detections)
+        t["preview"] = time.perf_counter()
+
+        cards.update(current_detections, now)
+        t["card_states"] = time.perf_counter()
+
+        for suit in SUITS:
+            render_suit_icons(suit, cards)
+        t["render_icons"] = time.perf_counter()
+
+        for suit in SUITS:
+            render_suit_images(suit, cards)
+        t["render_images"] = time.perf_counter()
+
+        render_progress_bar(cards, is_running=True)
+        t["progress_bar"] = time.perf_counter()
+
+        render_card_sum(current_detections)
+        t["card_sum"] = time.perf_counter()
+
+        encoder.to_base64(shown)
+        t["encode"] = time.perf_counter()
+
+        if i < warmup:
+            continue
+        previous = start
+        for stage in STAGES:
+            timings[stage].append(t[stage] - previous)
+            previous = t[stage]
+        timings["end_to_end"].append(previous - start)
+
+    return {stage: percentiles(samples) for stage, samples in timings.items()}
+
+
+def check(results, baseline, threshold, min_ms=0.05):
+    # A stage regresses when its p50 or p95 exceeds baseline * threshold.
+    # Stages under min_ms are ignored: their noise is bigger than the signal.
+    failures = []
+    for stage, stats in results.items():
+        base = baseline["stages"].get(stage)
+        if base is None:
+            continue
+        for key in ("p50", "p95"):
+            limit = max(base[key] * threshold, min_ms)
+            if stats[key] > limit:
+                failures.append(f"{stage} {key} {stats[key]:.2f} ms > {limit:.2f} ms "
+                                f"(baseline {base[key]:.2f} ms)")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark on synthetic card scenes.")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--scenes", type=int, default=20, help="distinct synthetic scenes")
+    parser.add_argument("--hold", type=int, default=15, help="frames each scene stays on the table")
+    parser.add_argument("--no-model", action="store_true", help="use ground truth instead of inference")
+    parser.add_argument("--save", help="write results as a JSON baseline")
+    parser.add_argument("--check", help="compare against a JSON baseline; exit 1 on regression")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="allowed slowdown factor vs. baseline (default: 1.25)")
+    args = parser.parse_args()
+
+    for name in logging.root.manager.loggerDict:
+        if name.startswith("streamlit"):
+            logging.getLogger(name).setLevel(logging.ERROR)
+
+    results = run(args.frames, args.scenes, args.hold, use_model=not args.no_model)
+
+    print(f"{'stage':<14} {'p50':>8} {'p95':>8} {'p99':>8}   (ms)")
+    for stage, stats in results.items():
+        print(f"{stage:<14} {stats['p50']:>8.3f} {stats['p95']:>8.3f} {stats['p99']:>8.3f}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "frames": args.frames,
+                "model": not args.no_model,
+                "machine": platform.platform(),
+                "stages": results,
+            }, f, indent=2)
+        print(f"Saved baseline to {args.save}")
+
+    if args.check:
+        with open(args.check) as f:
+            baseline = json.load(f)
+        failures = check(results, baseline, args.threshold)
+        if failures:
+            print("Regressions:")
+            for failure in failures:
+                print(f"  {failure}")
+            sys.exit(1)
+        print(f"No stage regressed past {args.threshold}x the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# JPEG encode cost for a 640x480 camera frame, per backend.
+#
+#   python -m benchmarks.encoder_bench [--frames 300] [--quality 85]
+import argparse
+import base64
+import glob
+import io
+import os
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from config import CARDS_DIR
+from encoder import FrameEncoder, OpenCVBackend, TurboJPEG, TurboJPEGBackend
+
+
+def make_frame(width=640, height=480):
+    # Table-like gradient with a few card images pasted on it
+    ramp = np.linspace(40, 110, width, dtype=np.uint8)
+    frame = np.dstack([np.tile(ramp, (height, 1))] * 3)
+    frame[..., 0] //= 2
+    for i, path in enumerate(sorted(glob.glob(os.path.join(CARDS_DIR, "*.png")))[:4]):
+        card = cv2.imread(path)
+        card = cv2.resize(card, (110, 160), interpolation=cv2.INTER_AREA)
+        x, y = 40 + i * 140, 150 + (i % 2) * 60
+        frame[y:y + 160, x:x + 110] = card
+    return frame
+
+
+def pil_base64(frame_bgr, quality):
+    # The original frame_to_base64 path
+    frame_rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
+    buffer = io.BytesIO()
+    Image.fromarray(frame_rgb).save(buffer, format="JPEG", quality=quality)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def bench(fn, frame, frames):
+    fn(frame)
+    start = time.perf_counter()
+    for _ in range(frames):
+        out = fn(frame)
+    return (time.perf_counter() - start) / frames * 1000, len(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Frame encoder benchmark.")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--quality", type=int, default=85)
+    args = parser.parse_args()
+
+    frame = make_frame()
+    cases = [("pil+base64 (legacy)", lambda f: pil_base64(f, args.quality))]
+    backends = [OpenCVBackend()]
+    if TurboJPEG is not None:
+        backends.append(TurboJPEGBackend())
+    for backend in backends:
+        encoder = FrameEncoder(backend, quality=args.quality, preview_width=None, budget_ms=None)
+        cases.append((f"{backend.name}+base64", encoder.to_base64))
+        cases.append((f"{backend.name} raw", encoder.encode))
+        preview = FrameEncoder(backend, quality=args.quality, preview_width=320, budget_ms=None)
+        cases.append((f"{backend.name} raw @320w", preview.encode))
+
+    print(f"640x480 frame, quality {args.quality}")
+    print(f"{'path':<24} {'ms/frame':>9} {'bytes':>8}")
+    for name, fn in cases:
+        ms, size = bench(fn, frame, args.frames)
+        print(f"{name:<24} {ms:>9.2f} {size:>8}")
+    if TurboJPEG is None:
+        print("(turbojpeg skipped: pip install PyTurboJPEG)")
+
+
+if __name__ == "__main__":
+    main()
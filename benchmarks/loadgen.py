@@ -0,0 +1,102 @@
+# Load generator for the detection service (service.py). Start the service,
+# then run N concurrent keep-alive clients posting synthetic JPEG frames:
+#
+#   python service.py &
+#   python -m benchmarks.loadgen [--clients 16] [--duration 20] [--port 8503 | --socket PATH]
+#
+# Prints throughput, client-side latency percentiles, 503 count and the
+# service's own /stats (queue depth, batch-size histogram).
+import argparse
+import asyncio
+import json
+import time
+
+import cv2
+import numpy as np
+
+from config import SERVICE_HOST, SERVICE_PORT
+from synthetic import make_scenes
+
+
+async def request(reader, writer, method, path, body=b""):
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: cardcv\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def connect(args):
+    if args.socket:
+        return await asyncio.open_unix_connection(args.socket)
+    return await asyncio.open_connection(args.host, args.port)
+
+
+async def client(args, payloads, offset, deadline, totals):
+    reader, writer = await connect(args)
+    i = offset
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status, _ = await request(reader, writer, "POST", "/detect", payloads[i % len(payloads)])
+            elapsed = time.perf_counter() - start
+            i += 1
+            if status == 200:
+                totals["latency"].append(elapsed)
+            elif status == 503:
+                totals["rejected"] += 1
+                await asyncio.sleep(args.backoff / 1000)
+            else:
+                totals["errors"] += 1
+    finally:
+        writer.close()
+
+
+async def run(args):
+    payloads = [cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, args.quality])[1].tobytes()
+                for frame, _ in make_scenes(args.frames, seed=args.seed)]
+    totals = {"latency": [], "rejected": 0, "errors": 0}
+    start = time.perf_counter()
+    await asyncio.gather(*(client(args, payloads, i, start + args.duration, totals) for i in range(args.clients)))
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await connect(args)
+    _, body = await request(reader, writer, "GET", "/stats")
+    writer.close()
+    return totals, elapsed, json.loads(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for the detection service.")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--socket", help="connect to this Unix socket instead of TCP")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent connections")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds")
+    parser.add_argument("--frames", type=int, default=32, help="distinct synthetic frames to cycle through")
+    parser.add_argument("--quality", type=int, default=85)
+    parser.add_argument("--backoff", type=float, default=5.0, help="ms a client waits after a 503")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    totals, elapsed, stats = asyncio.run(run(args))
+    ms = np.asarray(totals["latency"]) * 1000
+    print(f"{args.clients} clients, {elapsed:.1f}s: {len(ms)} ok, {totals['rejected']} rejected (503), "
+          f"{totals['errors']} errors, {len(ms) / elapsed:.1f} req/s")
+    if len(ms):
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        print(f"latency p50 {p50:.1f} ms  p95 {p95:.1f} ms  p99 {p99:.1f} ms  max {ms.max():.1f} ms")
+    print(f"service: {stats['batches']} batches, avg batch {stats['avg_batch_size']:.2f}, "
+          f"infer {stats['infer_ms_per_batch']:.1f} ms/batch, max queue {stats['max_queue_depth']}/{stats['max_queue']}")
+    print(f"batch sizes: {stats['batch_size_histogram']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# Per-frame post-processing cost: per-box tensor loop vs. Detections.
+#
+#   python -m benchmarks.postprocess_bench [--frames 2000]
+import argparse
+import time
+
+import numpy as np
+
+from config import RANKS, SUITS
+from postprocess import Detections
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+NAMES = dict(enumerate(f"{rank}{suit}" for suit in SUITS for rank in RANKS))
+
+
+class FakeBoxes:
+    # Mirrors the parts of ultralytics' Boxes both code paths touch.
+    def __init__(self, data):
+        self.data = data
+
+    @property
+    def xyxy(self):
+        return self.data[:, :4]
+
+    @property
+    def conf(self):
+        return self.data[:, 4]
+
+    @property
+    def cls(self):
+        return self.data[:, 5]
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        return (FakeBoxes(self.data[i:i + 1]) for i in range(len(self.data)))
+
+
+class FakeResult:
+    def __init__(self, boxes):
+        self.boxes = boxes
+        self.names = NAMES
+
+
+def make_result(n, rng):
+    xy = rng.uniform(0, 600, (n, 2))
+    data = np.column_stack([
+        xy, xy + rng.uniform(20, 120, (n, 2)),
+        rng.uniform(0.85, 1.0, n), rng.integers(0, 52, n),
+    ]).astype(np.float32)
+    if torch is not None:
+        data = torch.from_numpy(data)
+    return FakeResult(FakeBoxes(data))
+
+
+def legacy(result):
+    current_detections = {}
+    for box in result.boxes:
+        x1, y1, x2, y2 = map(int, box.xyxy[0])
+        name = NAMES[int(box.cls[0])]
+        conf = float(box.conf[0])
+        if name not in current_detections or conf > current_detections[name]:
+            current_detections[name] = conf
+    return current_detections
+
+
+def vectorized(result):
+    return Detections.from_result(result, NAMES).best_per_card()
+
+
+def time_per_frame(fn, result, frames):
+    start = time.perf_counter()
+    for _ in range(frames):
+        fn(result)
+    return (time.perf_counter() - start) / frames * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Post-processing microbenchmark.")
+    parser.add_argument("--frames", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"tensors: {'torch' if torch is not None else 'numpy'}")
+    print(f"{'boxes':>6} {'per-box loop':>14} {'Detections':>12} {'speedup':>8}")
+    for n in (1, 10, 50):
+        result = make_result(n, rng)
+        assert legacy(result) == vectorized(result)
+        old = time_per_frame(legacy, result, args.frames)
+        new = time_per_frame(vectorized, result, args.frames)
+        print(f"{n:>6} {old:>12.1f}us {new:>10.1f}us {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import numpy as np
+
+from config import CARD_IDS, CARD_INDEX, FADE_DURATION, GLOW_LEVELS, POP_DURATION, RANKS, SUITS
+
+_SUIT_SLICES = {suit: slice(i * len(RANKS), (i + 1) * len(RANKS)) for i, suit in enumerate(SUITS)}
+
+
+class CardTracker:
+    # Card state for one table in fixed 52-slot arrays indexed by CARD_INDEX,
+    # with ever-detected as a bitmask. update() applies one frame's
+    # detections and recomputes every card's fade and pop in one vectorized
+    # step; no strings are built per frame.
+    #
+    # Renderers read suit_keys() (the quantized state a card's HTML depends
+    # on, straight from the arrays) and `changed`, the cards whose rendered
+    # state moved in the last update, so untouched panels can be skipped.
+
+    def __init__(self, fade_duration=FADE_DURATION, pop_duration=POP_DURATION):
+        n = len(CARD_IDS)
+        self.fade_duration = fade_duration
+        self.pop_duration = pop_duration
+        self.conf = np.zeros(n)
+        self.first_seen = np.zeros(n)
+        self.last_seen = np.zeros(n)
+        self.live = np.zeros(n, bool)          # detected now or still fading
+        self.intensity = np.zeros(n)
+        self.popping = np.zeros(n, bool)
+        self.levels = np.zeros(n, np.int8)     # 0 = not glowing, else 1..GLOW_LEVELS
+        self.pops = np.zeros(n, bool)          # glowing and popping
+        self.seen = np.zeros(n, bool)          # dimmed "seen before" style
+        self.ever = 0                          # bit i set once CARD_IDS[i] was detected
+        self._ever_mask = np.zeros(n, bool)    # same, as an array
+        self.changed = set()
+
+    def update(self, current_detections, now):
+        # current_detections: {card_id: conf} (Detections.best_per_card())
+        idx, conf = [], []
+        for card_id, c in current_detections.items():
+            i = CARD_INDEX.get(card_id)
+            if i is not None:
+                idx.append(i)
+                conf.append(c)
+                self.ever |= 1 << i
+
+        detected = np.zeros(len(CARD_IDS), bool)
+        if idx:
+            detected[idx] = True
+            self.first_seen[detected & ~self.live] = now
+            self.conf[idx] = conf
+            self.last_seen[idx] = now
+            self._ever_mask[idx] = True
+
+        elapsed = now - self.last_seen
+        self.live = detected | (self.live & (elapsed < self.fade_duration))
+        fade = 1.0 - elapsed / self.fade_duration
+        fade[detected] = 1.0
+        self.intensity = self.conf * fade * self.live
+        self.popping = detected & ((now - self.first_seen) < self.pop_duration)
+
+        # Intensity quantized to 1..GLOW_LEVELS (the CSS_GLOW classes), 0 = not glowing
+        glowing = self.intensity > 0.01
+        levels = (np.clip(np.round(self.intensity * GLOW_LEVELS), 1, GLOW_LEVELS) * glowing).astype(np.int8)
+        pops = self.popping & glowing
+        seen = ~glowing & self._ever_mask
+        moved = (levels != self.levels) | (pops != self.pops) | (seen != self.seen)
+        self.changed = {CARD_IDS[i] for i in np.flatnonzero(moved)} if moved.any() else set()
+        self.levels, self.pops, self.seen = levels, pops, seen
+        return self
+
+    def seen_count(self, suit_key=None):
+        if suit_key is None:
+            return bin(self.ever).count("1")
+        s = _SUIT_SLICES[suit_key]
+        return bin((self.ever >> s.start) & ((1 << (s.stop - s.start)) - 1)).count("1")
+
+    def suit_keys(self, suit_key):
+        # (glow level, popping, seen) per rank, as the renderers cache them
+        s = _SUIT_SLICES[suit_key]
+        return tuple(zip(self.levels[s].tolist(), self.pops[s].tolist(), self.seen[s].tolist()))
+
+    def active_confidences(self):
+        return self.intensity[self.intensity > 0.01]
+
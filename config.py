@@ -3,6 +3,43 @@ import os
 BASE_DIR = os.path.dirname(__file__)
 CARDS_DIR = os.path.join(BASE_DIR, "assets", "cards")
 MODEL_PATH = os.path.join(BASE_DIR, "models", "playingCards.pt")
+ASSET_CACHE_DIR = os.path.join(BASE_DIR, ".cache")  # processed card assets, keyed by file mtimes
+
+# Frame source: a camera index, a video file, an image directory or
+# "synthetic[:seed]". Recordings replay at their own FPS (or SOURCE_FPS);
+# SOURCE_REALTIME = False replays as fast as possible on the same timeline.
+FRAME_SOURCE = 0
+SOURCE_FPS = None
+SOURCE_REALTIME = True
+SOURCE_LOOP = False
+SOURCE_RING_SIZE = 8   # preallocated frame slots; must exceed frames in flight
+CAPTURE_WIDTH = 640
+CAPTURE_HEIGHT = 480
+
+# Inference
+INFERENCE_BACKEND = "pytorch"  # "pytorch", "onnx", "openvino" (exported next to MODEL_PATH on first use)
+                               # or "onnx-int8" (built by quantize.py)
+EXPORT_DYNAMIC = True          # dynamic batch / image size in exported models
+INFER_IMGSZ = 320
+INFER_CONF = 0.85
+
+# Runtime profile written by tune.py (backend, imgsz, torch threads, fusion,
+# half precision) and applied by load_backend at startup. Overrides
+# INFERENCE_BACKEND / INFER_IMGSZ for this machine; delete it to go back.
+RUNTIME_PROFILE_PATH = os.path.join(BASE_DIR, "runtime_profile.json")
+TUNE_IMGSZ = (256, 320, 384, 416)   # imgsz candidates for tune.py
+TUNE_MIN_AGREEMENT = 0.95           # share of reference detections a profile must reproduce
+
+# Adaptive controller: moves imgsz and the processing rate to hold a latency
+# budget. Starts from INFER_IMGSZ and the top of ADAPT_FPS_RANGE.
+ADAPTIVE_ENABLED = False
+ADAPT_TARGET_MS = 33.0           # end-to-end budget, capture to finished frame
+ADAPT_IMGSZ_RANGE = (224, 480)   # multiples of 32
+ADAPT_FPS_RANGE = (5, 30)        # processing rate bounds
+ADAPT_SMOOTHING = 0.2            # EMA weight of each new latency sample
+ADAPT_HEADROOM = 0.7             # scale back up only below this share of the budget
+ADAPT_COOLDOWN = 2.0             # seconds between changes
+ADAPT_LOG_PATH = None            # e.g. "controller.jsonl": one line per decision
 
 SUITS = {
     "C": {"symbol": "\u2663", "color": "#2e7d32", "glow": "#4caf50"},  # Clubs - green
@@ -13,6 +50,10 @@ SUITS = {
 
 RANKS = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"]
 
+# Fixed slot per card (suit-major: AC..KC, AS..KS, AH..KH, AD..KD)
+CARD_IDS = [f"{rank}{suit}" for suit in SUITS for rank in RANKS]
+CARD_INDEX = {card_id: i for i, card_id in enumerate(CARD_IDS)}
+
 SUIT_BGR = {
     "C": (80, 125, 46),   # green
     "S": (192, 101, 21),   # blue
@@ -20,9 +61,93 @@ SUIT_BGR = {
     "D": (0, 101, 230),    # orange
 }
 
+SPRITE_CARD_SIZE = (76, 110)  # px per card in the Images-mode sprite sheet (~2x display size)
+
+GLOW_LEVELS = 20  # quantized glow intensities emitted once per suit in CSS_GLOW
+
 FADE_DURATION = 0.8   # seconds to fade out after card disappears
 POP_DURATION = 0.35   # seconds for the scale-up micro-animation
 
+# Motion gate: skip inference on static frames, duty-cycle when the table is empty
+MOTION_GATE_ENABLED = False
+MOTION_SIZE = (64, 48)    # thumbnail the frame difference is computed on
+MOTION_THRESHOLD = 4.0    # mean absolute grey-level difference that counts as motion
+MOTION_MAX_SKIP = 15      # re-run inference at least every N frames even when static
+IDLE_AFTER = 5.0          # seconds without cards or motion before sampling slows down
+IDLE_FPS = 4              # sampling rate while idle
+
+# Detect every N frames and carry boxes forward with optical flow in between
+TRACKING_ENABLED = False
+DETECT_EVERY_N = 3
+TRACK_IOU = 0.3             # min IoU to associate a detection with a track
+TRACK_MAX_MISSES = 2        # detection rounds a track survives without a match
+TRACK_MIN_QUALITY = 0.5     # share of flow points still tracked; below this, detect now
+TRACK_CONF_SMOOTHING = 0.5  # EMA weight of the previous confidence
+
+# Per-stage timing spans (near-zero cost when disabled)
+METRICS_ENABLED = False
+METRICS_WINDOW = 300            # samples kept per stage for FPS and percentiles
+METRICS_OVERLAY = "sidebar"     # "sidebar", "frame" or None
+METRICS_EXPORT_PATH = None      # e.g. "metrics.prom" (Prometheus text) or "metrics.json"
+METRICS_EXPORT_INTERVAL = 5.0   # seconds between exports
+
+# Multi-stream mode (multistream.py): one process, several tables, one
+# batched model call over the latest frame from each
+MULTISTREAM_MAX_BATCH = 8          # frames per model call; more streams are split
+MULTISTREAM_REPORT_INTERVAL = 5.0  # seconds between per-stream reports
+
+# Local detection service (service.py): POST a JPEG, get detections back.
+# Concurrent requests are micro-batched into one model call.
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8503
+SERVICE_SOCKET = None          # Unix socket path to listen on instead of TCP
+SERVICE_MAX_BATCH = 8          # frames per model call
+SERVICE_MAX_WAIT_MS = 5.0      # how long a batch waits to fill after its first request
+SERVICE_MAX_QUEUE = 32         # requests queued or in flight; beyond this -> 503
+
+# Detection log (detlog.py): every frame's detections appended to a
+# memory-mappable binary log plus a per-block card index. None = off.
+DETLOG_PATH = None             # e.g. os.path.join(BASE_DIR, "detections.cardlog")
+DETLOG_FLUSH_INTERVAL = 1.0    # seconds a block may wait before it is written
+DETLOG_BLOCK_FRAMES = 256      # frames per block (one index entry each)
+DETLOG_QUEUE_SIZE = 1024       # frames waiting for the writer; beyond this they are dropped
+
+# The app runs one detection engine per process; every viewer renders its
+# output. A tab closed without pressing Stop lets go after this many seconds.
+ENGINE_IDLE_TIMEOUT = 10.0
+
+PIPELINE_QUEUE_SIZE = 1      # frames held between stages (older ones are dropped)
+SHOW_PIPELINE_STATS = False  # per-stage timings / queue depth / drops under the controls
+
+# Optional MJPEG endpoint for the camera feed. When enabled the page embeds
+# the stream once instead of pushing a base64 <img> through Streamlit per frame.
+MJPEG_ENABLED = False
+MJPEG_HOST = "0.0.0.0"
+MJPEG_PORT = 8502
+MJPEG_PUBLIC_URL = None  # e.g. "http://table-01:8502/stream.mjpg"; None = same host as the page
+
+# State sync: card panels, progress bar and card sum are rendered once and
+# then patched in the browser from per-frame card-state deltas, streamed as
+# server-sent events on MJPEG_PORT (/events). All viewers share one table
+# state kept by the engine.
+STATE_SYNC_ENABLED = False
+STATE_SYNC_HISTORY = 256  # deltas kept for slow clients; further behind -> full snapshot
+
+# Camera feed JPEG encoding
+ENCODER_BACKEND = "auto"      # "auto" (TurboJPEG if installed), "turbojpeg" or "opencv"
+ENCODER_QUALITY = 85
+ENCODER_MIN_QUALITY = 50
+ENCODER_PREVIEW_WIDTH = 640   # downscale wider frames to this; None = full size
+ENCODER_MIN_WIDTH = 320
+ENCODER_BUDGET_MS = 8.0       # per-frame encode budget; None disables adaptation
+
+# Camera feed preview (preview.py). Inference reads the native capture
+# frame; viewers get a copy downscaled to ENCODER_PREVIEW_WIDTH with the
+# boxes scaled onto it, so CAPTURE_WIDTH can go up without costing encode time.
+PREVIEW_FPS = None            # previews built and encoded per second; None = every frame
+PREVIEW_OVERLAY = "draw"      # "draw" boxes into the preview, or "html": send box coordinates
+                              # and let the page draw them (base64 feed only; MJPEG always draws)
+
 CARD_VALUES = {
     "A": 1, "2": 2, "3": 3, "4": 4, "5": 5,
     "6": 6, "7": 7, "8": 8, "9": 9, "10": 10,
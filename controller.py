@@ -0,0 +1,103 @@
+import json
+import time
+from collections import deque
+
+from config import (
+    ADAPT_COOLDOWN, ADAPT_FPS_RANGE, ADAPT_HEADROOM, ADAPT_IMGSZ_RANGE, ADAPT_LOG_PATH,
+    ADAPT_SMOOTHING, ADAPT_TARGET_MS, INFER_IMGSZ,
+)
+
+IMGSZ_STEP = 32  # YOLO input sizes are multiples of the model stride
+
+
+class LatencyController:
+    # Holds end-to-end latency (capture -> finished frame) near target_ms by
+    # moving the inference imgsz and the processing rate within bounds.
+    #
+    # Over budget it first shrinks imgsz one step, as long as inference is
+    # a big share of the latency, then lowers the rate. With headroom it
+    # undoes those in reverse: rate first, then imgsz. Latencies are EMA
+    # smoothed, there is a dead band between headroom * target and target,
+    # and nothing changes within cooldown seconds of the last change, so
+    # the resolution doesn't oscillate.
+    #
+    # Every change is kept in `decisions` (and appended to log_path as JSON
+    # lines) together with the latencies that triggered it.
+
+    def __init__(self, target_ms=ADAPT_TARGET_MS, imgsz=INFER_IMGSZ, imgsz_range=ADAPT_IMGSZ_RANGE,
+                 fps_range=ADAPT_FPS_RANGE, smoothing=ADAPT_SMOOTHING, headroom=ADAPT_HEADROOM,
+                 cooldown=ADAPT_COOLDOWN, log_path=ADAPT_LOG_PATH):
+        self.target = target_ms / 1000
+        self.min_imgsz, self.max_imgsz = imgsz_range
+        self.min_fps, self.max_fps = fps_range
+        self.imgsz = min(max(imgsz // IMGSZ_STEP * IMGSZ_STEP, self.min_imgsz), self.max_imgsz)
+        self.fps = self.max_fps
+        self.smoothing = smoothing
+        self.headroom = headroom
+        self.cooldown = cooldown
+        self.log_path = log_path
+        self.latency = None
+        self.infer_latency = None
+        self.decisions = deque(maxlen=200)
+        self._last_change = time.monotonic()
+        self._next_frame = 0.0
+
+    def _smooth(self, previous, sample):
+        if previous is None:
+            return sample
+        return previous + self.smoothing * (sample - previous)
+
+    def throttle(self):
+        # Called before each capture; sleeps to hold the processing rate
+        now = time.monotonic()
+        if self._next_frame > now:
+            time.sleep(self._next_frame - now)
+            now = self._next_frame
+        self._next_frame = now + 1.0 / self.fps
+
+    def observe(self, latency, infer_latency=None):
+        # latency / infer_latency in seconds; infer_latency is None for frames
+        # that skipped the model (motion gate, tracker)
+        self.latency = self._smooth(self.latency, latency)
+        if infer_latency is not None:
+            self.infer_latency = self._smooth(self.infer_latency, infer_latency)
+
+        now = time.monotonic()
+        if now - self._last_change < self.cooldown:
+            return None
+
+        infer_share = (self.infer_latency or 0.0) / self.latency if self.latency else 0.0
+        action = None
+        if self.latency > self.target:
+            if self.imgsz > self.min_imgsz and infer_share >= 0.5:
+                self.imgsz -= IMGSZ_STEP
+                action = "imgsz_down"
+            elif self.fps > self.min_fps:
+                self.fps = max(self.min_fps, self.fps * 0.8)
+                action = "fps_down"
+        elif self.latency < self.target * self.headroom:
+            if self.fps < self.max_fps:
+                self.fps = min(self.max_fps, self.fps * 1.25)
+                action = "fps_up"
+            elif self.imgsz < self.max_imgsz:
+                self.imgsz += IMGSZ_STEP
+                action = "imgsz_up"
+        if action is None:
+            return None
+
+        self._last_change = now
+        decision = {
+            "time": time.time(), "action": action, "imgsz": self.imgsz, "fps": round(self.fps, 2),
+            "latency_ms": round(self.latency * 1000, 2),
+            "infer_ms": round(self.infer_latency * 1000, 2) if self.infer_latency is not None else None,
+            "target_ms": self.target * 1000,
+        }
+        self.decisions.append(decision)
+        if self.log_path:
+            with open(self.log_path, "a") as f:
+                f.write(json.dumps(decision) + "\n")
+        return decision
+
+    def describe(self):
+        latency = f"{self.latency * 1000:.0f}" if self.latency is not None else "-"
+        return f"imgsz={self.imgsz} fps={self.fps:.0f} e2e={latency}/{self.target * 1000:.0f}ms"
@@ -1,54 +1,184 @@
+import argparse
+import threading
+import time
+
 import cv2
-from ultralytics import YOLO
 
-from config import MODEL_PATH
+from backends import BACKENDS, load_backend, model_imgsz, warm_up
+from batch import run_batch
+from card_tracker import CardTracker
+from config import (
+    ADAPT_LOG_PATH, ADAPT_TARGET_MS, ADAPTIVE_ENABLED, DETLOG_PATH, INFER_CONF, INFER_IMGSZ,
+    INFERENCE_BACKEND, METRICS_ENABLED, METRICS_EXPORT_INTERVAL, METRICS_EXPORT_PATH,
+)
+from controller import LatencyController
+from detlog import DetectionLogWriter
+from metrics import Metrics, PeriodicExporter
+from postprocess import Detections
+from sources import open_source
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Playing card detection without the web UI.")
+    parser.add_argument("--source", default="0",
+                        help="camera index, video file, image directory or synthetic[:seed] (default: 0)")
+    parser.add_argument("--batch", action="store_true",
+                        help="headless batch mode: score every frame of a file, directory or synthetic "
+                             "--source and write --out")
+    parser.add_argument("--fps", type=float, help="replay rate for files / synthetic (default: the file's own)")
+    parser.add_argument("--fast", action="store_true", help="replay as fast as possible instead of in real time")
+    parser.add_argument("--loop", action="store_true", help="restart file / synthetic sources at the end")
+    parser.add_argument("--headless", action="store_true", help="no window; print FPS when the source ends")
+    parser.add_argument("--out", default="detections.jsonl",
+                        help="batch output file, .jsonl or .csv (default: detections.jsonl)")
+    parser.add_argument("--batch-size", type=int, default=8, help="frames per model call (default: 8)")
+    parser.add_argument("--imgsz", type=int,
+                        help=f"inference size (default: runtime profile, else {INFER_IMGSZ})")
+    parser.add_argument("--conf", type=float, default=INFER_CONF,
+                        help=f"batch confidence threshold (default: {INFER_CONF})")
+    parser.add_argument("--backend", choices=list(BACKENDS),
+                        help=f"inference backend (default: runtime profile, else {INFERENCE_BACKEND})")
+    parser.add_argument("--adaptive", action="store_true", default=ADAPTIVE_ENABLED,
+                        help="adapt imgsz and processing rate to hold --target-ms")
+    parser.add_argument("--target-ms", type=float, default=ADAPT_TARGET_MS,
+                        help=f"latency budget for --adaptive (default: {ADAPT_TARGET_MS:g})")
+    parser.add_argument("--controller-log", default=ADAPT_LOG_PATH,
+                        help="append each --adaptive decision to this file as JSON lines")
+    parser.add_argument("--metrics", action="store_true",
+                        help="time each stage and show FPS / p50 / p95 / p99 on the frame")
+    parser.add_argument("--metrics-export", default=METRICS_EXPORT_PATH,
+                        help="write metrics periodically to this file (.prom for Prometheus text, else JSON)")
+    parser.add_argument("--log", default=DETLOG_PATH,
+                        help="append every frame's detections to this detection log (see detlog.py)")
+    args = parser.parse_args()
+    if args.batch and args.source.isdigit():
+        # A camera never ends, so the batch would never finish
+        parser.error("--batch needs a video file, image directory or synthetic --source, not a camera")
+    return args
+
+
+def batch_main(args):
+    model = load_backend(args.backend)
+    frames, elapsed = run_batch(model, args.source, args.out, batch_size=args.batch_size,
+                                imgsz=args.imgsz, conf=args.conf)
+    fps = frames / elapsed if elapsed > 0 else 0.0
+    print(f"Processed {frames} frames in {elapsed:.1f}s ({fps:.1f} FPS) -> {args.out}")
+
+
+def load_in_background(args):
+    # Load and warm the model on a daemon thread, so an early exit doesn't
+    # wait for it. Returns a function that joins and returns the model.
+    result = {}
+
+    def load():
+        try:
+            result["model"] = warm_up(load_backend(args.backend), args.imgsz)
+        except Exception as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=load, name="model-loader", daemon=True)
+    thread.start()
+
+    def get():
+        thread.join()
+        if "error" in result:
+            raise result["error"]
+        return result["model"]
+    return get
 
 
 def main():
-    model = YOLO(MODEL_PATH)
-
-    # Open webcam at 30 FPS
-    cap = cv2.VideoCapture(0)
-    cap.set(cv2.CAP_PROP_FPS, 30)
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    # Time to first detection is measured from here, so it excludes
+    # interpreter startup and module imports
+    started = time.perf_counter()
+    args = parse_args()
+    if args.batch:
+        batch_main(args)
+        return
+
+    # Load and warm the model while the camera opens
+    loading = load_in_background(args)
+
+    # Webcam, recording or synthetic scenes; files replay at their own FPS
+    cap = open_source(args.source, fps=args.fps, realtime=not args.fast, loop=args.loop)
     if not cap.isOpened():
-        print("Error: Could not open webcam.")
+        print(f"Error: Could not open source {args.source}.")
         exit()
+    model = loading()
+    args.imgsz = args.imgsz or model_imgsz(model)
+    first_detection = None
+
+    metrics = Metrics(enabled=METRICS_ENABLED or args.metrics)
+    exporter = PeriodicExporter(metrics, args.metrics_export, METRICS_EXPORT_INTERVAL)
+    controller = None
+    if args.adaptive:
+        controller = LatencyController(target_ms=args.target_ms, imgsz=args.imgsz, log_path=args.controller_log)
+    cards = CardTracker()
+    detlog = DetectionLogWriter(args.log) if args.log else None
+    frames = 0
+    start = time.perf_counter()
 
     while True:
-        ret, frame = cap.read()
+        if controller is not None:
+            controller.throttle()
+        with metrics.span("capture"):
+            ret, frame = cap.read()
         if not ret:
             break
+        captured = time.perf_counter()
 
         # Run inference
-        results = model(frame, imgsz=320, verbose=False)
+        imgsz = controller.imgsz if controller is not None else args.imgsz
+        with metrics.span("inference"):
+            results = model(frame, imgsz=imgsz, verbose=False)
+        inferred = time.perf_counter()
 
         # Draw detections
-        for box in results[0].boxes:
-            # Bounding box coordinates
-            x1, y1, x2, y2 = map(int, box.xyxy[0])
+        with metrics.span("postprocess"):
+            detections = Detections.from_result(results[0], model.names)
+        with metrics.span("draw"):
+            detections.draw(frame, box_color=(0, 255, 0), text_color=(255, 255, 255))
+        with metrics.span("card_states"):
+            cards.update(detections.best_per_card(), cap.timestamp)
+        if detlog is not None:
+            detlog.add(cap.timestamp, detections)
+        if first_detection is None and len(detections):
+            first_detection = time.perf_counter() - started
+            print(f"First detected frame {first_detection:.2f}s after start (imports excluded)")
+        cv2.putText(frame, f"{cards.seen_count()}/52 seen", (frame.shape[1] - 110, 20),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        if metrics.enabled:
+            metrics.draw_overlay(frame)
 
-            # Class name and confidence
-            cls_id = int(box.cls[0])
-            name = model.names[cls_id]
-            conf = int(box.conf[0] * 100)
-            label = f"{name} ({conf}%)"
+        if controller is not None:
+            decision = controller.observe(time.perf_counter() - captured, inferred - captured)
+            if decision is not None and args.headless:
+                print(f"{decision['action']}: {controller.describe()}")
 
-            # Draw box and label
-            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-            cv2.putText(frame, label, (x1, y1 - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        frames += 1
+        metrics.tick()
+        exporter.maybe_export()
+        if args.headless:
+            continue
 
-        cv2.imshow("Playing Card Detection", frame)
+        with metrics.span("display"):
+            cv2.imshow("Playing Card Detection", frame)
 
         # Press 'q' to quit
         if cv2.waitKey(1) & 0xFF == ord("q"):
             break
 
     cap.release()
-    cv2.destroyAllWindows()
+    if detlog is not None:
+        detlog.close()
+    if args.headless:
+        elapsed = time.perf_counter() - start
+        print(f"Processed {frames} frames in {elapsed:.1f}s ({frames / elapsed if elapsed else 0:.1f} FPS), "
+              f"{cards.seen_count()}/52 cards seen")
+        if controller is not None:
+            print(f"Controller settled at {controller.describe()}")
+    else:
+        cv2.destroyAllWindows()
 
 
 if __name__ == "__main__":
@@ -1,65 +1,86 @@
 import base64
+import glob
+import hashlib
+import io
 import os
 
 import streamlit as st
-from ultralytics import YOLO
 
+from backends import load_backend
 from config import (
-    CARDS_DIR, MODEL_PATH, RANK_TO_FILENAME, SUIT_TO_FILENAME,
-    FADE_DURATION, POP_DURATION,
+    ASSET_CACHE_DIR, CARDS_DIR, RANK_TO_FILENAME, SUIT_TO_FILENAME,
+    RANKS, SUITS, SPRITE_CARD_SIZE,
 )
 
 
 @st.cache_resource
 def load_model():
-    return YOLO(MODEL_PATH)
+    return load_backend()
 
 
-@st.cache_data
-def load_card_images():
-    images = {}
-    for rank_key, rank_name in RANK_TO_FILENAME.items():
-        for suit_key, suit_name in SUIT_TO_FILENAME.items():
-            card_id = f"{rank_key}{suit_key}"
-            filename = f"{rank_name}_of_{suit_name}.png"
-            filepath = os.path.join(CARDS_DIR, filename)
-            if os.path.exists(filepath):
-                with open(filepath, "rb") as f:
-                    b64 = base64.b64encode(f.read()).decode()
-                images[card_id] = f"data:image/png;base64,{b64}"
-    return images
-
+def _sprite_cache_path():
+    # Keyed by every card file's name, size and mtime plus the sprite size,
+    # so replacing an asset (or SPRITE_CARD_SIZE) rebuilds the sheet
+    digest = hashlib.sha1(repr(SPRITE_CARD_SIZE).encode())
+    names = sorted(os.listdir(CARDS_DIR)) if os.path.isdir(CARDS_DIR) else []
+    for name in names:
+        stat = os.stat(os.path.join(CARDS_DIR, name))
+        digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return os.path.join(ASSET_CACHE_DIR, f"card_sprites_{digest.hexdigest()[:16]}.css")
 
-CARD_IMAGES = load_card_images()
 
+@st.cache_data
+def load_card_sprites():
+    # Built once per asset change and kept on disk, so a fresh process skips
+    # decoding and resizing 52 PNGs
+    path = _sprite_cache_path()
+    if os.path.exists(path):
+        with open(path) as f:
+            return f.read()
 
-def compute_card_states(current_detections, now):
-    history = st.session_state.card_history
+    css = _build_card_sprites()
+    try:
+        os.makedirs(ASSET_CACHE_DIR, exist_ok=True)
+        for stale in glob.glob(os.path.join(ASSET_CACHE_DIR, "card_sprites_*.css")):
+            os.remove(stale)
+        with open(f"{path}.tmp", "w") as f:
+            f.write(css)
+        os.replace(f"{path}.tmp", path)
+    except OSError:
+        pass  # read-only checkout: rebuild next time
+    return css
 
-    st.session_state.ever_detected.update(current_detections.keys())
 
-    for card_id, conf in current_detections.items():
-        if card_id not in history or "first_seen" not in history[card_id]:
-            history[card_id] = {"conf": conf, "last_seen": now, "first_seen": now}
-        else:
-            history[card_id]["conf"] = conf
-            history[card_id]["last_seen"] = now
+def _build_card_sprites():
+    from PIL import Image, features
 
-    states = {}
-    expired = []
-    for card_id, info in history.items():
-        if card_id in current_detections:
-            is_popping = (now - info["first_seen"]) < POP_DURATION
-            states[card_id] = (info["conf"], is_popping)
-        else:
-            elapsed = now - info["last_seen"]
-            if elapsed < FADE_DURATION:
-                fade = 1.0 - (elapsed / FADE_DURATION)
-                states[card_id] = (info["conf"] * fade, False)
-            else:
-                expired.append(card_id)
+    # Packs all 52 cards into one downscaled sprite sheet and returns a
+    # stylesheet that inlines it once, plus a background-position class per
+    # card (.art-AS, .art-10H, ...). Panels then only reference class names.
+    w, h = SPRITE_CARD_SIZE
+    sheet = Image.new("RGBA", (w * len(RANKS), h * len(SUITS)))
+    rules = []
+    for row, (suit_key, suit_name) in enumerate(SUIT_TO_FILENAME.items()):
+        for col, rank_key in enumerate(RANKS):
+            filepath = os.path.join(CARDS_DIR, f"{RANK_TO_FILENAME[rank_key]}_of_{suit_name}.png")
+            if os.path.exists(filepath):
+                with Image.open(filepath) as img:
+                    sheet.paste(img.convert("RGBA").resize((w, h), Image.LANCZOS), (col * w, row * h))
+            x = col / (len(RANKS) - 1) * 100
+            y = row / (len(SUITS) - 1) * 100
+            rules.append(f".art-{rank_key}{suit_key}{{background-position:{x:.4f}% {y:.4f}%}}")
 
-    for card_id in expired:
-        del history[card_id]
+    buffer = io.BytesIO()
+    if features.check("webp"):
+        sheet.save(buffer, format="WEBP", lossless=True)
+        mime = "image/webp"
+    else:
+        sheet.save(buffer, format="PNG", optimize=True)
+        mime = "image/png"
+    b64 = base64.b64encode(buffer.getvalue()).decode()
+    return (
+        f"<style>.card .art{{background-image:url(data:{mime};base64,{b64});}}"
+        + "".join(rules)
+        + "</style>"
+    )
 
-    return states
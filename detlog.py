@@ -0,0 +1,352 @@
+import argparse
+import os
+import queue
+import struct
+import threading
+import time
+
+import numpy as np
+
+from config import CARD_IDS, CARD_INDEX, DETLOG_BLOCK_FRAMES, DETLOG_FLUSH_INTERVAL, DETLOG_QUEUE_SIZE
+
+# Append-only detection log. The log file is a 16-byte header followed by
+# fixed-size little-endian RECORDs, one per detection, so it can be
+# memory-mapped as a numpy array without parsing. A frame with no cards
+# still gets one record (card = NO_CARD) so the log keeps the full frame
+# timeline for coverage queries.
+#
+# The sidecar <log>.idx holds one BLOCK entry per flushed group of records:
+# where the group starts, its frame and time range, and a 52-bit mask of
+# the cards in it. Per-card queries read the index (a few hundred KB for a
+# day of frames) and touch only the blocks whose mask has the card.
+
+MAGIC = b"CARDLOG\x01"
+RECORD = np.dtype([
+    ("t", "<f8"),          # source timestamp (epoch seconds)
+    ("frame", "<u4"),      # frame number within the log
+    ("card", "<u2"),       # CARD_INDEX, or NO_CARD
+    ("conf", "<f4"),
+    ("box", "<i4", (4,)),  # x1, y1, x2, y2
+])
+BLOCK = np.dtype([
+    ("start", "<u8"),      # first record
+    ("count", "<u4"),
+    ("frame0", "<u4"),
+    ("frame1", "<u4"),
+    ("t0", "<f8"),
+    ("t1", "<f8"),
+    ("cards", "<u8"),      # bit i set if CARD_IDS[i] occurs in the block
+])
+HEADER = struct.Struct("<8sII")  # magic, record size, reserved
+NO_CARD = 0xFFFF
+
+
+def index_path(path):
+    return path + ".idx"
+
+
+def _block(records, start):
+    cards = records["card"][records["card"] != NO_CARD]
+    mask = int(np.bitwise_or.reduce(np.left_shift(np.uint64(1), cards.astype(np.uint64)))) if len(cards) else 0
+    return np.array([(start, len(records), records["frame"][0], records["frame"][-1],
+                      records["t"].min(), records["t"].max(), mask)], BLOCK)
+
+
+def _read_header(f, path):
+    magic, size, _ = HEADER.unpack(f.read(HEADER.size).ljust(HEADER.size, b"\0"))
+    if magic != MAGIC or size != RECORD.itemsize:
+        raise ValueError(f"{path} is not a detection log (or was written by an incompatible version)")
+
+
+def _open_records(path):
+    with open(path, "rb") as f:
+        _read_header(f, path)
+    count = (os.path.getsize(path) - HEADER.size) // RECORD.itemsize
+    if not count:
+        return np.empty(0, RECORD)
+    return np.memmap(path, RECORD, "r", offset=HEADER.size, shape=(count,))
+
+
+def _open_index(path):
+    try:
+        return np.fromfile(index_path(path), BLOCK)
+    except FileNotFoundError:
+        return np.empty(0, BLOCK)
+
+
+class DetectionLogWriter:
+    # add() only puts the frame on a queue, so the capture / inference loop
+    # never touches the disk. A background thread groups frames into blocks
+    # of up to block_frames (or whatever arrived within flush_interval),
+    # appends their records, then the block's index entry. If the queue is
+    # full the frame is dropped and counted rather than blocking the loop.
+    #
+    # Opening an existing log appends to it; records a crash left without
+    # an index entry are indexed first.
+
+    def __init__(self, path, flush_interval=DETLOG_FLUSH_INTERVAL, block_frames=DETLOG_BLOCK_FRAMES,
+                 queue_size=DETLOG_QUEUE_SIZE):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.block_frames = block_frames
+        self.frames = 0
+        self.records = 0
+        self.drops = 0
+        self._luts = {}
+        self._queue = queue.Queue(queue_size)
+        self._open()
+        self._thread = threading.Thread(target=self._run, name="detlog-writer", daemon=True)
+        self._thread.start()
+
+    def _open(self):
+        if os.path.exists(self.path) and os.path.getsize(self.path):
+            # Drop a torn trailing record, then index anything unindexed
+            with open(self.path, "rb") as f:
+                _read_header(f, self.path)
+            size = os.path.getsize(self.path)
+            count = (size - HEADER.size) // RECORD.itemsize
+            if HEADER.size + count * RECORD.itemsize != size:
+                os.truncate(self.path, HEADER.size + count * RECORD.itemsize)
+            index = _open_index(self.path)
+            indexed = int(index["start"][-1] + index["count"][-1]) if len(index) else 0
+            if indexed > count:
+                raise ValueError(f"{index_path(self.path)} doesn't match {self.path}")
+            records = _open_records(self.path)
+            if indexed < count:
+                with open(index_path(self.path), "ab") as f:
+                    f.write(_block(np.array(records[indexed:]), indexed).tobytes())
+            self.frames = int(records["frame"][-1]) + 1 if count else 0
+            self.records = count
+            del records
+            self._file = open(self.path, "ab")
+            self._index = open(index_path(self.path), "ab")
+        else:
+            self._file = open(self.path, "wb")
+            self._file.write(HEADER.pack(MAGIC, RECORD.itemsize, 0))
+            self._file.flush()
+            # A new log: an index left over from a deleted one doesn't apply
+            self._index = open(index_path(self.path), "wb")
+
+    def add(self, t, detections):
+        # detections: postprocess.Detections for one frame
+        try:
+            self._queue.put_nowait((t, detections))
+        except queue.Full:
+            self.drops += 1
+
+    def _lut(self, names):
+        # model class id -> CARD_INDEX
+        cached = self._luts.get(id(names))
+        if cached is None or cached[0] is not names:
+            lut = np.full(max(names) + 1, NO_CARD, np.uint16)
+            for cls, name in names.items():
+                lut[cls] = CARD_INDEX.get(name, NO_CARD)
+            cached = self._luts[id(names)] = (names, lut)
+        return cached[1]
+
+    def _records(self, frames):
+        counts = [max(len(d), 1) for _, d in frames]
+        records = np.zeros(sum(counts), RECORD)
+        records["card"] = NO_CARD
+        i = 0
+        for (t, detections), n in zip(frames, counts):
+            rows = records[i:i + n]
+            rows["t"] = t
+            rows["frame"] = self.frames
+            if len(detections):
+                rows["card"] = self._lut(detections.names)[detections.cls]
+                rows["conf"] = detections.conf
+                rows["box"] = detections.xyxy
+            self.frames += 1
+            i += n
+        return records
+
+    def _write(self, frames):
+        records = self._records(frames)
+        self._file.write(records.tobytes())
+        self._file.flush()
+        # Records first, index after: a crash in between leaves records
+        # that the next open indexes, never an entry pointing past the end
+        self._index.write(_block(records, self.records).tobytes())
+        self._index.flush()
+        self.records += len(records)
+
+    def _run(self):
+        frames, deadline = [], None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False
+            if item is None:
+                break
+            if item:
+                frames.append(item)
+                deadline = deadline or time.monotonic() + self.flush_interval
+            if frames and (len(frames) >= self.block_frames or time.monotonic() >= deadline):
+                self._write(frames)
+                frames, deadline = [], None
+        if frames:
+            self._write(frames)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class DetectionLog:
+    # Read side. Records stay memory-mapped; only the blocks a query needs
+    # are paged in, so multi-hour logs are never loaded whole. Records
+    # written after the last index entry (a log still being written) are
+    # covered by one extra in-memory block.
+
+    def __init__(self, path):
+        self.path = path
+        self.records = _open_records(path)
+        self.index = _open_index(path)
+        indexed = int(self.index["start"][-1] + self.index["count"][-1]) if len(self.index) else 0
+        if indexed > len(self.records):
+            raise ValueError(f"{index_path(path)} doesn't match {path}")
+        if indexed < len(self.records):
+            self.index = np.concatenate([self.index, _block(np.array(self.records[indexed:]), indexed)])
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def frames(self):
+        return int(self.index["frame1"][-1]) + 1 if len(self.index) else 0
+
+    @property
+    def span(self):
+        if not len(self.index):
+            return None, None
+        return float(self.index["t0"].min()), float(self.index["t1"].max())
+
+    def _blocks(self, t0=None, t1=None, card=None):
+        mask = np.ones(len(self.index), bool)
+        if t0 is not None:
+            mask &= self.index["t1"] >= t0
+        if t1 is not None:
+            mask &= self.index["t0"] < t1
+        if card is not None:
+            mask &= (self.index["cards"] >> np.uint64(CARD_INDEX[card])) & np.uint64(1) == 1
+        return self.index[mask]
+
+    def _read(self, block):
+        start = int(block["start"])
+        return self.records[start:start + int(block["count"])]
+
+    def query(self, t0=None, t1=None, card=None):
+        # Detections in [t0, t1), optionally of one card, as a RECORD array
+        out = []
+        for block in self._blocks(t0, t1, card):
+            rows = self._read(block)
+            mask = rows["card"] != NO_CARD if card is None else rows["card"] == CARD_INDEX[card]
+            if t0 is not None:
+                mask &= rows["t"] >= t0
+            if t1 is not None:
+                mask &= rows["t"] < t1
+            out.append(np.array(rows[mask]))
+        return np.concatenate(out) if out else np.empty(0, RECORD)
+
+    def last_seen(self, card, before=None):
+        # Newest record of `card` (before `before`), or None
+        for block in self._blocks(t1=before, card=card)[::-1]:
+            rows = self._read(block)
+            mask = rows["card"] == CARD_INDEX[card]
+            if before is not None:
+                mask &= rows["t"] < before
+            if mask.any():
+                return np.array(rows[np.flatnonzero(mask)[-1]])
+        return None
+
+    def seen_cards(self, t0=None, t1=None):
+        # Cards detected in any block overlapping [t0, t1); from the index only
+        mask = int(np.bitwise_or.reduce(self._blocks(t0, t1)["cards"])) if len(self.index) else 0
+        return [card_id for i, card_id in enumerate(CARD_IDS) if mask >> i & 1]
+
+    def coverage(self, bucket=60.0, t0=None, t1=None):
+        # -> (bucket start times, (n, 52) share of each bucket's frames in
+        # which each card was detected). Streams block by block.
+        first, last = self.span
+        if first is None:
+            return np.empty(0), np.empty((0, len(CARD_IDS)))
+        t0 = first if t0 is None else t0
+        t1 = last + 1e-9 if t1 is None else t1
+        n = max(1, int(np.ceil((t1 - t0) / bucket)))
+        frames = np.zeros(n, np.int64)
+        hits = np.zeros(n * len(CARD_IDS), np.int64)
+        for block in self._blocks(t0, t1):
+            rows = self._read(block)
+            rows = rows[(rows["t"] >= t0) & (rows["t"] < t1)]
+            if not len(rows):
+                continue
+            buckets = ((rows["t"] - t0) // bucket).astype(np.int64)
+            # Frame numbers ascend within a block: a frame's first row counts it
+            first_row = np.r_[True, rows["frame"][1:] != rows["frame"][:-1]]
+            frames += np.bincount(buckets[first_row], minlength=n)
+            cards = rows["card"] != NO_CARD
+            # One hit per (frame, card) even if the card was boxed twice
+            keys = rows["frame"][cards].astype(np.int64) << 6 | rows["card"][cards]
+            _, first = np.unique(keys, return_index=True)
+            hits += np.bincount((buckets[cards] * len(CARD_IDS) + rows["card"][cards])[first], minlength=len(hits))
+        share = hits.reshape(n, len(CARD_IDS)) / np.maximum(frames, 1)[:, None]
+        return t0 + np.arange(n) * bucket, share
+
+
+def _fmt_time(t):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t)) + f".{int(t % 1 * 1000):03d}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and query a detection log.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    info = sub.add_parser("info", help="frames, records, time span and cards seen")
+    info.add_argument("log")
+
+    last = sub.add_parser("last-seen", help="when each card was last detected")
+    last.add_argument("log")
+    last.add_argument("cards", nargs="*", help="card ids, e.g. QH 10S (default: all seen)")
+
+    cover = sub.add_parser("coverage", help="share of frames each card was visible, per time bucket")
+    cover.add_argument("log")
+    cover.add_argument("--bucket", type=float, default=60.0, help="bucket length in seconds (default: 60)")
+    cover.add_argument("--cards", nargs="+", help="card ids (default: all seen)")
+    args = parser.parse_args()
+
+    log = DetectionLog(args.log)
+    if args.command == "info":
+        first, last_t = log.span
+        print(f"{log.frames} frames, {len(log)} records, {len(log.index)} blocks")
+        if first is not None:
+            print(f"{_fmt_time(first)} .. {_fmt_time(last_t)} ({last_t - first:.1f}s)")
+        seen = log.seen_cards()
+        print(f"{len(seen)}/52 cards seen: {' '.join(seen)}")
+    elif args.command == "last-seen":
+        for card in args.cards or log.seen_cards():
+            if card not in CARD_INDEX:
+                parser.error(f"unknown card {card!r}")
+            row = log.last_seen(card)
+            print(f"{card:<4} " + ("never" if row is None else
+                                  f"{_fmt_time(float(row['t']))}  frame {int(row['frame'])}  conf {float(row['conf']):.2f}"))
+    else:
+        cards = args.cards or log.seen_cards()
+        starts, share = log.coverage(args.bucket)
+        print("time                     " + " ".join(f"{card:>4}" for card in cards))
+        for t, row in zip(starts, share):
+            print(f"{_fmt_time(t)}  " + " ".join(f"{row[CARD_INDEX[card]]:4.0%}" for card in cards))
+
+
+if __name__ == "__main__":
+    main()
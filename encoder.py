@@ -0,0 +1,130 @@
+import base64
+import time
+
+import cv2
+import numpy as np
+
+from config import (
+    ENCODER_BACKEND, ENCODER_BUDGET_MS, ENCODER_MIN_QUALITY, ENCODER_MIN_WIDTH,
+    ENCODER_PREVIEW_WIDTH, ENCODER_QUALITY,
+)
+
+try:
+    from turbojpeg import TJPF_BGR, TurboJPEG
+except ImportError:
+    TurboJPEG = None
+
+
+class OpenCVBackend:
+    name = "opencv"
+
+    def encode(self, frame_bgr, quality):
+        ok, buf = cv2.imencode(".jpg", frame_bgr, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise ValueError("JPEG encoding failed")
+        return buf.tobytes()
+
+
+class TurboJPEGBackend:
+    name = "turbojpeg"
+
+    def __init__(self):
+        self._jpeg = TurboJPEG()
+
+    def encode(self, frame_bgr, quality):
+        return self._jpeg.encode(frame_bgr, quality=quality, pixel_format=TJPF_BGR)
+
+
+def get_backend(name=ENCODER_BACKEND):
+    # "auto" prefers TurboJPEG when PyTurboJPEG and libturbojpeg are installed.
+    if name in ("auto", "turbojpeg") and TurboJPEG is not None:
+        try:
+            return TurboJPEGBackend()
+        except (OSError, RuntimeError):
+            if name == "turbojpeg":
+                raise
+    elif name == "turbojpeg":
+        raise ImportError("PyTurboJPEG is not installed")
+    return OpenCVBackend()
+
+
+class FrameEncoder:
+    # Encodes BGR frames straight to JPEG (no RGB/PIL copies), optionally
+    # downscaled to a preview width. With a budget, quality and preview width
+    # step down when encoding runs over it and back up when there is headroom.
+
+    ADAPT_EVERY = 15  # frames between adjustments, so settings don't oscillate
+
+    def __init__(self, backend=ENCODER_BACKEND, quality=ENCODER_QUALITY,
+                 preview_width=ENCODER_PREVIEW_WIDTH, budget_ms=ENCODER_BUDGET_MS,
+                 min_quality=ENCODER_MIN_QUALITY, min_width=ENCODER_MIN_WIDTH):
+        self.backend = get_backend(backend) if isinstance(backend, str) else backend
+        self.max_quality = quality
+        self.max_width = preview_width
+        self.min_quality = min(min_quality, quality)
+        self.min_width = min_width if preview_width is None else min(min_width, preview_width)
+        self.budget_ms = budget_ms
+        self.quality = quality
+        self.width = preview_width
+        self.avg_ms = None
+        self._since_adapt = 0
+        self._resized = None
+
+    def resize(self, frame_bgr):
+        # Downscales into one buffer reused from frame to frame, so the
+        # result is only valid until the next call
+        if self.width is None or frame_bgr.shape[1] <= self.width:
+            return frame_bgr
+        shape = (round(frame_bgr.shape[0] * self.width / frame_bgr.shape[1]), self.width) + frame_bgr.shape[2:]
+        if self._resized is None or self._resized.shape != shape or self._resized.dtype != frame_bgr.dtype:
+            self._resized = np.empty(shape, frame_bgr.dtype)
+        return cv2.resize(frame_bgr, (shape[1], shape[0]), dst=self._resized, interpolation=cv2.INTER_AREA)
+
+    def encode(self, frame_bgr):
+        start = time.perf_counter()
+        data = self.backend.encode(self.resize(frame_bgr), self.quality)
+        if self.budget_ms:
+            self._adapt((time.perf_counter() - start) * 1000)
+        return data
+
+    def to_base64(self, frame_bgr):
+        return base64.b64encode(self.encode(frame_bgr)).decode()
+
+    def _adapt(self, elapsed_ms):
+        self.avg_ms = elapsed_ms if self.avg_ms is None else 0.8 * self.avg_ms + 0.2 * elapsed_ms
+        self._since_adapt += 1
+        if self._since_adapt < self.ADAPT_EVERY:
+            return
+
+        if self.avg_ms > self.budget_ms:
+            # Over budget: give up quality first, then resolution
+            if self.quality > self.min_quality:
+                self.quality = max(self.min_quality, self.quality - 5)
+            elif self.width is not None and self.width > self.min_width:
+                self.width = max(self.min_width, int(self.width * 0.85))
+            else:
+                return
+        elif self.avg_ms < self.budget_ms * 0.6:
+            # Headroom: restore resolution first, then quality
+            if self.width is not None and self.width < self.max_width:
+                self.width = min(self.max_width, int(self.width / 0.85) + 1)
+            elif self.quality < self.max_quality:
+                self.quality = min(self.max_quality, self.quality + 5)
+            else:
+                return
+        else:
+            return
+        self._since_adapt = 0
+        self.avg_ms = None
+
+
+_default_encoder = None
+
+
+def frame_to_base64(frame_bgr, encoder=None):
+    global _default_encoder
+    if encoder is None:
+        if _default_encoder is None:
+            _default_encoder = FrameEncoder()
+        encoder = _default_encoder
+    return encoder.to_base64(frame_bgr)
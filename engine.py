@@ -0,0 +1,324 @@
+import threading
+import time
+
+from backends import load_backend, model_imgsz, warm_up
+from config import (
+    ADAPTIVE_ENABLED, DETLOG_PATH, ENGINE_IDLE_TIMEOUT, FRAME_SOURCE, INFER_CONF, METRICS_EXPORT_INTERVAL,
+    METRICS_EXPORT_PATH, METRICS_OVERLAY, MJPEG_ENABLED, MOTION_GATE_ENABLED, SOURCE_FPS, SOURCE_LOOP,
+    SOURCE_REALTIME, STATE_SYNC_ENABLED, TRACKING_ENABLED,
+)
+from metrics import Metrics, PeriodicExporter
+from pipeline import FramePipeline, format_stats
+
+# cv2, ultralytics and everything built on them are imported on first use
+# (warm_up() or the first Start), not when the page script loads.
+
+
+class DetectionEngine:
+    # One per process, shared by every browser session. Owns the frame
+    # source, the model and the capture / inference / encode pipeline, and
+    # publishes the newest annotated frame and detection set with a sequence
+    # number. Sessions only render what was published, so N viewers cost one
+    # inference per frame, and a rerun doesn't touch the pipeline.
+    #
+    # The pipeline runs while at least one session holds a lease. wait()
+    # renews the caller's lease; a tab closed without pressing Stop expires
+    # after idle_timeout, and the camera is released once nobody is left.
+
+    def __init__(self, load_model=load_backend, idle_timeout=ENGINE_IDLE_TIMEOUT):
+        self._load_model = load_model
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._warm_thread = None
+        self.startup = {}
+        self.idle_timeout = idle_timeout
+        self.metrics = Metrics()
+        self.mjpeg = None
+        self._http = None
+        self.error = None
+        self.seq = 0
+        self._exporter = PeriodicExporter(self.metrics, METRICS_EXPORT_PATH, METRICS_EXPORT_INTERVAL)
+        self._lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._leases = {}
+        self._latest = None
+        self._source = None
+        self._pipeline = None
+        self._gate = None
+        self.controller = None
+        self._detlog = None
+        self._stop_event = None
+        # State sync: one table state for every viewer, streamed as deltas
+        self.sync = None
+        self.cards = None
+        if STATE_SYNC_ENABLED:
+            from card_tracker import CardTracker
+            from statesync import StateSync
+
+            self.sync = StateSync()
+            self.cards = CardTracker()
+
+    @property
+    def running(self):
+        return self._pipeline is not None
+
+    @property
+    def viewers(self):
+        return len(self._leases)
+
+    def subscribe(self, viewer_id):
+        # Returns False when the source could not be opened (see .error)
+        with self._lock:
+            self._leases[viewer_id] = time.monotonic()
+            if self._pipeline is None and not self._start():
+                del self._leases[viewer_id]
+                return False
+            return True
+
+    def unsubscribe(self, viewer_id):
+        with self._lock:
+            self._leases.pop(viewer_id, None)
+            if not self._leases and self._pipeline is not None:
+                self._stop()
+
+    def wait(self, viewer_id, last_seq, timeout=1.0):
+        # Newest published item if it is newer than last_seq, else None
+        with self._lock:
+            if viewer_id in self._leases:
+                self._leases[viewer_id] = time.monotonic()
+        with self._cond:
+            if not self._is_new(last_seq) and self.running:
+                self._cond.wait(timeout)
+            return self._latest if self._is_new(last_seq) else None
+
+    def _is_new(self, last_seq):
+        return self._latest is not None and self._latest["seq"] != last_seq
+
+    def describe(self):
+        if self._pipeline is None:
+            return ""
+        stats = format_stats(self._pipeline.stats())
+        if self._gate is not None:
+            stats += " · " + self._gate.describe()
+        if self.controller is not None:
+            stats += " · " + self.controller.describe()
+        if self._preview.interval:
+            stats += f" · preview {1 / self._preview.interval:.0f} fps"
+        if "first_detection_s" in self.startup:
+            stats += f" · first card {self.startup['first_detection_s']:.2f}s"
+        return f"{stats} · viewers={self.viewers}"
+
+    def warm_up(self):
+        # Loads the model and runs one dummy inference on a background thread,
+        # so the first Start doesn't pay for imports, weights and lazy init
+        # inside the live loop. Safe to call on every rerun.
+        if self._warm_thread is None:
+            self._warm_thread = threading.Thread(target=self._warm, name="engine-warmup", daemon=True)
+            self._warm_thread.start()
+
+    def _warm(self):
+        try:
+            self._get_model()
+        except Exception as e:
+            # Start retries the load and reports it the same way
+            self.error = f"Could not load the model: {e}"
+
+    def _get_model(self):
+        with self._model_lock:
+            if self._model is None:
+                start = time.perf_counter()
+                model = self._load_model()
+                loaded = time.perf_counter()
+                warm_up(model)
+                self.startup["model_load_s"] = loaded - start
+                self.startup["warmup_s"] = time.perf_counter() - loaded
+                self._model = model
+            return self._model
+
+    # --- Pipeline ---
+
+    def _start(self):
+        from controller import LatencyController
+        from detlog import DetectionLogWriter
+        from encoder import FrameEncoder
+        from mjpeg import MJPEGServer
+        from motion import MotionGate
+        from preview import Preview, box_coords
+        from postprocess import Detections
+        from sources import open_source
+        from tracker import BoxTracker
+
+        self.error = None
+        started = time.perf_counter()
+        # Model and HTTP server first, so a failure there leaves no camera open
+        try:
+            # Waits for warm_up() if it is still running
+            self._model = self._get_model()
+        except Exception as e:
+            self.error = f"Could not load the model: {e}"
+            return False
+        if (MJPEG_ENABLED or self.sync is not None) and self._http is None:
+            try:
+                self._http = MJPEGServer(events=self.sync).start()
+            except OSError as e:
+                self.error = f"Could not start the stream server: {e}"
+                return False
+            self.mjpeg = self._http if MJPEG_ENABLED else None
+
+        source = open_source(FRAME_SOURCE, fps=SOURCE_FPS, realtime=SOURCE_REALTIME, loop=SOURCE_LOOP)
+        if not source.isOpened():
+            source.release()
+            self.error = "Could not open webcam."
+            return False
+
+        self._parse = Detections.from_result
+        self._started = started
+        for key in ("first_frame_s", "first_detection_s"):
+            self.startup.pop(key, None)
+        self._source = source
+        with self._cond:
+            self._latest = None
+        self._gate = MotionGate() if MOTION_GATE_ENABLED else None
+        self._tracker = BoxTracker() if TRACKING_ENABLED else None
+        self._imgsz = model_imgsz(self._model)
+        self.controller = LatencyController(imgsz=self._imgsz) if ADAPTIVE_ENABLED else None
+        self._previous = None
+        self._encoder = FrameEncoder()
+        self._preview = Preview(self._encoder)
+        self._box_coords = box_coords
+        self._detlog = DetectionLogWriter(DETLOG_PATH) if DETLOG_PATH else None
+        self._overlay_on_frame = self.metrics.enabled and METRICS_OVERLAY == "frame"
+
+        # Capture, inference and encoding each run on their own thread; the
+        # publisher hands the newest finished frame to subscribed sessions.
+        self._pipeline = FramePipeline(
+            self._read_frame, [("inference", self._detect), ("encode", self._encode)]).start()
+        self._stop_event = threading.Event()
+        threading.Thread(target=self._publish_loop, args=(self._pipeline, self._stop_event),
+                         name="engine-publisher", daemon=True).start()
+        return True
+
+    def _stop(self):
+        # Caller holds self._lock
+        self._stop_event.set()
+        self._pipeline.stop()
+        self._pipeline = None
+        self._source.release()
+        self._source = None
+        if self._detlog is not None:
+            self._detlog.close()
+            self._detlog = None
+        if self.sync is not None:
+            self.sync.publish(self.cards, {}, is_running=False)
+        with self._cond:
+            self._cond.notify_all()
+
+    def _read_frame(self):
+        if self._gate is not None and self._gate.idle:
+            time.sleep(self._gate.idle_interval())
+        elif self.controller is not None:
+            self.controller.throttle()
+        with self.metrics.span("capture"):
+            ret, frame = self._source.read()
+        if not ret:
+            return None
+        return {"frame": frame, "t": self._source.timestamp, "captured": time.perf_counter(), "infer": None}
+
+    def _detect(self, item):
+        frame = item["frame"]
+        gate, tracker, previous = self._gate, self._tracker, self._previous
+        cards_present = previous is not None and len(previous) > 0
+        if gate is None or gate.check(frame, item["t"], cards_present) or previous is None:
+            if tracker is not None and not tracker.needs_detection():
+                with self.metrics.span("track"):
+                    self._previous = tracker.track(frame)
+            else:
+                imgsz = self.controller.imgsz if self.controller is not None else self._imgsz
+                start = time.perf_counter()
+                with self.metrics.span("inference"):
+                    results = self._model(frame, imgsz=imgsz, conf=INFER_CONF, verbose=False)
+                item["infer"] = time.perf_counter() - start
+                with self.metrics.span("postprocess"):
+                    self._previous = self._parse(results[0], self._model.names)
+                    if tracker is not None:
+                        self._previous = tracker.update(frame, self._previous)
+        # Static scene: the previous detections still apply to this frame
+        detections = self._previous
+        detlog = self._detlog
+        if detlog is not None:
+            detlog.add(item["t"], detections)
+
+        # Boxes go onto the preview in the encode stage, never onto the
+        # capture frame
+        item["boxes"] = detections
+        item["detections"] = detections.best_per_card()
+        return item
+
+    def _encode(self, item):
+        frame = item.pop("frame")
+        boxes = item.pop("boxes")
+        item["img_str"] = item["overlay"] = None
+        if not self._preview.due():
+            return item
+        # The MJPEG feed can't carry coordinates, so it always gets drawn boxes
+        draw = self._preview.overlay == "draw" or self.mjpeg is not None
+        with self.metrics.span("draw"):
+            preview = self._preview.render(frame, boxes, draw, writable=self._overlay_on_frame)
+            if self._overlay_on_frame:
+                self.metrics.draw_overlay(preview)
+        with self.metrics.span("encode"):
+            if self.mjpeg is not None:
+                self.mjpeg.publish(self._encoder.encode(preview))
+            else:
+                item["img_str"] = self._encoder.to_base64(preview)
+        if not draw:
+            item["overlay"] = self._box_coords(boxes, frame.shape)
+        return item
+
+    def _record_startup(self, item):
+        # Time from Start (source open) to the first published frame and the
+        # first frame with a card in it
+        elapsed = time.perf_counter() - self._started
+        self.startup.setdefault("first_frame_s", elapsed)
+        if item["detections"]:
+            self.startup["first_detection_s"] = elapsed
+            if self.metrics.enabled:
+                self.metrics.record("time_to_first_detection", elapsed)
+
+    def _publish_loop(self, pipeline, stop_event):
+        while not stop_event.is_set():
+            item = pipeline.get(timeout=0.5)
+            failure = None
+            if item is not None:
+                with self._cond:
+                    self.seq += 1
+                    item["seq"] = self.seq
+                    self._latest = item
+                    self._cond.notify_all()
+                if self.controller is not None:
+                    self.controller.observe(time.perf_counter() - item["captured"], item["infer"])
+                if "first_detection_s" not in self.startup:
+                    self._record_startup(item)
+                if self.sync is not None:
+                    self.cards.update(item["detections"], item["t"])
+                    self.sync.publish(self.cards, item["detections"])
+                self.metrics.tick()
+                self._exporter.maybe_export()
+            elif pipeline.error is not None:
+                failure = f"Detection pipeline failed: {pipeline.error}"
+            elif pipeline.closed:
+                failure = "Lost webcam feed."
+
+            with self._lock:
+                # A pipeline closed by _stop() (or replaced) is not a failure
+                if self._pipeline is not pipeline:
+                    break
+                if failure is not None:
+                    self.error = failure
+                deadline = time.monotonic() - self.idle_timeout
+                for viewer_id, seen in list(self._leases.items()):
+                    if seen < deadline:
+                        del self._leases[viewer_id]
+                if self.error is not None or not self._leases:
+                    self._stop()
+                    break
@@ -0,0 +1,154 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from config import METRICS_ENABLED, METRICS_WINDOW
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("_metrics", "_name", "_start")
+
+    def __init__(self, metrics, name):
+        self._metrics = metrics
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._metrics.record(self._name, time.perf_counter() - self._start)
+        return False
+
+
+class Metrics:
+    # Rolling per-stage timings. span(name) times a block; tick() marks a
+    # finished frame for FPS. Disabled, span() hands back one shared no-op
+    # context manager, so instrumented code pays a method call and nothing
+    # else.
+
+    def __init__(self, enabled=METRICS_ENABLED, window=METRICS_WINDOW):
+        self.enabled = enabled
+        self.window = window
+        self._samples = {}
+        self._totals = {}  # name -> [count, seconds] since start, for Prometheus
+        self._frames = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def span(self, name):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def record(self, name, seconds):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+                self._totals[name] = [0, 0.0]
+            samples.append(seconds)
+            totals = self._totals[name]
+            totals[0] += 1
+            totals[1] += seconds
+
+    def tick(self):
+        if self.enabled:
+            self._frames.append(time.perf_counter())
+
+    def fps(self):
+        frames = list(self._frames)
+        if len(frames) < 2 or frames[-1] == frames[0]:
+            return 0.0
+        return (len(frames) - 1) / (frames[-1] - frames[0])
+
+    def summary(self):
+        with self._lock:
+            snapshot = {name: np.fromiter(samples, float) for name, samples in self._samples.items()}
+            totals = {name: tuple(total) for name, total in self._totals.items()}
+        stages = {}
+        for name, samples in snapshot.items():
+            if not len(samples):
+                continue
+            p50, p95, p99 = np.percentile(samples * 1000, [50, 95, 99])
+            stages[name] = {"p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99),
+                            "count": len(samples), "total_count": totals[name][0],
+                            "total_seconds": totals[name][1]}
+        return {"fps": self.fps(), "stages": stages}
+
+    def to_json(self):
+        return json.dumps({"timestamp": time.time(), **self.summary()}, indent=2)
+
+    def to_prometheus(self):
+        summary = self.summary()
+        lines = [
+            "# HELP cardcv_fps Frames per second over the rolling window.",
+            "# TYPE cardcv_fps gauge",
+            f"cardcv_fps {summary['fps']:.3f}",
+            "# HELP cardcv_stage_latency_seconds Per-stage latency; quantiles over the rolling window,"
+            " count and sum since start.",
+            "# TYPE cardcv_stage_latency_seconds summary",
+        ]
+        for name, stats in sorted(summary["stages"].items()):
+            for quantile, key in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms")):
+                lines.append(f'cardcv_stage_latency_seconds{{stage="{name}",quantile="{quantile}"}} '
+                             f"{stats[key] / 1000:.6f}")
+            lines.append(f'cardcv_stage_latency_seconds_sum{{stage="{name}"}} {stats["total_seconds"]:.6f}')
+            lines.append(f'cardcv_stage_latency_seconds_count{{stage="{name}"}} {stats["total_count"]}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        # .prom / .txt -> Prometheus text format, anything else -> JSON.
+        # Written to a temp file and renamed so a scraper never reads half a file.
+        text = self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_json()
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    def lines(self):
+        summary = self.summary()
+        out = [f"{summary['fps']:.1f} FPS"]
+        for name, stats in summary["stages"].items():
+            out.append(f"{name} {stats['p50_ms']:.1f}/{stats['p95_ms']:.1f}/{stats['p99_ms']:.1f} ms")
+        return out
+
+    def draw_overlay(self, frame):
+        import cv2
+
+        for i, line in enumerate(self.lines()):
+            y = 18 + i * 16
+            cv2.putText(frame, line, (8, y), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 0, 0), 3)
+            cv2.putText(frame, line, (8, y), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (255, 255, 255), 1)
+        return frame
+
+
+class PeriodicExporter:
+    # Calls metrics.export(path) at most once per interval
+    def __init__(self, metrics, path, interval):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._last = 0.0
+
+    def maybe_export(self):
+        if not self.path or not self.metrics.enabled:
+            return
+        now = time.monotonic()
+        if now - self._last >= self.interval:
+            self._last = now
+            self.metrics.export(self.path)
@@ -0,0 +1,154 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+from config import MJPEG_HOST, MJPEG_PORT
+
+BOUNDARY = b"frame"
+
+
+class MJPEGServer:
+    # Serves the latest published JPEG as multipart/x-mixed-replace on
+    # /stream.mjpg (and as a single image on /frame.jpg) from a background
+    # thread. The page embeds the stream once; frames travel as raw bytes.
+    # With a StateSync attached, card-state deltas are streamed as
+    # server-sent events on /events?style=icons|images.
+
+    def __init__(self, host=MJPEG_HOST, port=MJPEG_PORT, events=None):
+        self.host = host
+        self.port = port
+        self.events = events
+        self._frame = None
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._httpd = None
+        self.viewers = 0
+
+    def start(self):
+        if self._httpd is not None:
+            return self
+        self._httpd = _Server((self.host, self.port), _Handler)
+        self._httpd.mjpeg = self
+        threading.Thread(target=self._httpd.serve_forever, name="mjpeg-server", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+        with self._cond:
+            self._cond.notify_all()
+
+    @property
+    def running(self):
+        return self._httpd is not None
+
+    def publish(self, jpeg_bytes):
+        with self._cond:
+            self._frame = jpeg_bytes
+            self._seq += 1
+            self._cond.notify_all()
+
+    def add_viewer(self, delta):
+        with self._cond:
+            self.viewers += delta
+
+    def wait_frame(self, last_seq, timeout=1.0):
+        # Blocks until a frame newer than last_seq is published.
+        with self._cond:
+            if self._seq == last_seq and self.running:
+                self._cond.wait(timeout)
+            return self._seq, self._frame if self._seq != last_seq else None
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        mjpeg = self.server.mjpeg
+        path, _, query = self.path.partition("?")
+        if path == "/frame.jpg":
+            self._send_frame(mjpeg)
+        elif path == "/stream.mjpg":
+            self._send_stream(mjpeg)
+        elif path == "/events" and mjpeg.events is not None:
+            style = parse_qs(query).get("style", ["icons"])[0]
+            self._send_events(mjpeg, style if style in mjpeg.events.STYLES else "icons")
+        else:
+            self.send_error(404)
+
+    def _send_frame(self, mjpeg):
+        _, frame = mjpeg.wait_frame(0, timeout=0)
+        if frame is None:
+            self.send_error(503, "No frame yet")
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(frame)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(frame)
+
+    def _send_stream(self, mjpeg):
+        self.send_response(200)
+        self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY.decode()}")
+        self.send_header("Cache-Control", "no-store")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        mjpeg.add_viewer(1)
+        seq = 0
+        try:
+            while mjpeg.running:
+                seq, frame = mjpeg.wait_frame(seq)
+                if frame is None:
+                    continue
+                self.wfile.write(
+                    b"--" + BOUNDARY + b"\r\n"
+                    b"Content-Type: image/jpeg\r\n"
+                    b"Content-Length: " + str(len(frame)).encode() + b"\r\n\r\n"
+                )
+                self.wfile.write(frame)
+                self.wfile.write(b"\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            mjpeg.add_viewer(-1)
+
+    def _send_events(self, mjpeg, style):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-store")
+        # The page is served by Streamlit from another port
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        sync = mjpeg.events
+        seq = None
+        try:
+            while mjpeg.running:
+                if seq is None:
+                    # New client, or one that fell too far behind
+                    seq, delta = sync.snapshot()
+                    self.wfile.write(sync.message(seq, delta, style))
+                    self.wfile.flush()
+                    continue
+                deltas = sync.wait(seq)
+                if deltas is None:
+                    seq = None
+                    continue
+                if not deltas:
+                    self.wfile.write(b":\n\n")  # keep-alive comment
+                for seq, delta, cache in deltas:
+                    self.wfile.write(sync.message(seq, delta, style, cache))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,69 @@
+import cv2
+import numpy as np
+
+from config import IDLE_AFTER, IDLE_FPS, MOTION_MAX_SKIP, MOTION_SIZE, MOTION_THRESHOLD
+
+
+class MotionGate:
+    # Decides per frame whether inference is needed. Frames are compared on a
+    # tiny grayscale thumbnail against the last frame that was inferred; a
+    # static scene reuses the previous detections. Inference is still forced
+    # every max_skip frames so confidences don't go stale.
+    #
+    # After idle_after seconds with no cards and no motion the gate goes idle
+    # and idle_interval() asks the capture loop to sample at idle_fps until
+    # motion shows up again.
+
+    def __init__(self, threshold=MOTION_THRESHOLD, size=MOTION_SIZE, max_skip=MOTION_MAX_SKIP,
+                 idle_after=IDLE_AFTER, idle_fps=IDLE_FPS):
+        self.threshold = threshold
+        self.size = size
+        self.max_skip = max_skip
+        self.idle_after = idle_after
+        self.idle_fps = idle_fps
+        self._reference = None
+        self._last_active = None
+        self._since_infer = 0
+        self.checked = 0
+        self.skipped = 0
+        self.idle = False
+        self.last_motion = 0.0
+
+    def _thumbnail(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        return cv2.resize(gray, self.size, interpolation=cv2.INTER_AREA)
+
+    def check(self, frame, now, cards_present):
+        small = self._thumbnail(frame)
+        self.checked += 1
+        if self._last_active is None:
+            self._last_active = now
+
+        if self._reference is None:
+            moved = True
+            self.last_motion = float("inf")
+        else:
+            self.last_motion = float(np.mean(cv2.absdiff(small, self._reference)))
+            moved = self.last_motion > self.threshold
+
+        if moved or cards_present:
+            self._last_active = now
+        self.idle = (now - self._last_active) > self.idle_after
+
+        if moved or self._since_infer >= self.max_skip:
+            self._reference = small
+            self._since_infer = 0
+            return True
+        self._since_infer += 1
+        self.skipped += 1
+        return False
+
+    def idle_interval(self):
+        return 1.0 / self.idle_fps if self.idle and self.idle_fps else 0.0
+
+    @property
+    def skip_ratio(self):
+        return self.skipped / self.checked if self.checked else 0.0
+
+    def describe(self):
+        return f"gate skip={self.skip_ratio:.0%}" + (" idle" if self.idle else "")
@@ -0,0 +1,209 @@
+import argparse
+import time
+from collections import deque
+
+import numpy as np
+
+from card_tracker import CardTracker
+from config import (
+    INFER_CONF, METRICS_WINDOW, MULTISTREAM_MAX_BATCH,
+    MULTISTREAM_REPORT_INTERVAL,
+)
+from pipeline import LatestQueue, Stage
+from postprocess import Detections
+from sources import open_source
+
+
+class Stream:
+    # One watched table: a capture thread that keeps only the newest frame,
+    # plus the table's own card state so streams never share history.
+
+    def __init__(self, name, spec, fps=None, realtime=True, loop=False, window=METRICS_WINDOW):
+        self.name = name
+        self.spec = spec
+        # No frame ring: a frame can wait in the queue and then in a batch
+        # while the capture thread keeps reading
+        self.source = open_source(spec, fps=fps, realtime=realtime, loop=loop, ring_size=0)
+        self.queue = LatestQueue(1)
+        self.capture = Stage(f"capture-{name}", self._read, None, self.queue)
+        self.cards = CardTracker()
+        self.current = {}
+        self.frames = 0
+        self._done = deque(maxlen=window)
+        self._latency = deque(maxlen=window)
+
+    def _read(self):
+        ok, frame = self.source.read()
+        if not ok:
+            return None
+        return {"frame": frame, "t": self.source.timestamp, "captured": time.perf_counter()}
+
+    @property
+    def finished(self):
+        return self.queue.closed and not len(self.queue)
+
+    @property
+    def error(self):
+        # A capture thread that raised has closed its queue; the stream is
+        # finished and this says why
+        return self.capture.error
+
+    def handle(self, item, detections):
+        self.current = detections.best_per_card()
+        self.cards.update(self.current, item["t"])
+        done = time.perf_counter()
+        self._done.append(done)
+        self._latency.append(done - item["captured"])
+        self.frames += 1
+
+    def stats(self):
+        done = list(self._done)
+        fps = (len(done) - 1) / (done[-1] - done[0]) if len(done) > 1 and done[-1] > done[0] else 0.0
+        latency = np.fromiter(self._latency, float) * 1000
+        p50, p95 = np.percentile(latency, [50, 95]) if len(latency) else (0.0, 0.0)
+        return {
+            "stream": self.name, "frames": self.frames, "fps": fps,
+            "latency_p50_ms": float(p50), "latency_p95_ms": float(p95),
+            "drops": self.queue.drops, "cards": len(self.current), "seen": self.cards.seen_count(),
+            "error": None if self.error is None else str(self.error),
+        }
+
+
+class MultiStream:
+    # Gathers the latest frame from every stream that has one and runs them
+    # through the model as one batch, then routes each result back to its
+    # stream. The per-call overhead is paid once per batch instead of once
+    # per camera.
+
+    def __init__(self, model, streams, imgsz=None, conf=INFER_CONF, max_batch=MULTISTREAM_MAX_BATCH):
+        from backends import model_imgsz
+
+        self.model = model
+        self.streams = streams
+        self.imgsz = imgsz or model_imgsz(model)
+        self.conf = conf
+        self.max_batch = max(1, max_batch)
+        self.batches = 0
+        self.batched_frames = 0
+        self.infer_time = 0.0
+        self._failed = set()
+
+    def start(self):
+        for stream in self.streams:
+            stream.capture.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        for stream in self.streams:
+            stream.capture.stop()
+            stream.queue.close()
+        for stream in self.streams:
+            if stream.capture.is_alive():
+                stream.capture.join(timeout)
+            stream.source.release()
+
+    @property
+    def finished(self):
+        return all(stream.finished for stream in self.streams)
+
+    def new_failures(self):
+        # Streams whose capture failed since the last call; the rest keep running
+        failed = [stream for stream in self.streams
+                  if stream.error is not None and stream not in self._failed]
+        self._failed.update(failed)
+        return failed
+
+    def step(self, wait=0.005):
+        # Returns the number of frames processed; 0 means nothing was ready
+        ready = []
+        for stream in self.streams:
+            item = stream.queue.get(timeout=0)
+            if item is not None:
+                ready.append((stream, item))
+        if not ready:
+            time.sleep(wait)
+            return 0
+
+        for i in range(0, len(ready), self.max_batch):
+            chunk = ready[i:i + self.max_batch]
+            start = time.perf_counter()
+            results = self.model([item["frame"] for _, item in chunk], imgsz=self.imgsz,
+                                 conf=self.conf, verbose=False)
+            self.infer_time += time.perf_counter() - start
+            self.batches += 1
+            self.batched_frames += len(chunk)
+            for (stream, item), result in zip(chunk, results):
+                stream.handle(item, Detections.from_result(result, self.model.names))
+        return len(ready)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "avg_batch": self.batched_frames / self.batches if self.batches else 0.0,
+            "infer_ms_per_batch": self.infer_time / self.batches * 1000 if self.batches else 0.0,
+            "streams": [stream.stats() for stream in self.streams],
+        }
+
+
+def format_report(stats, elapsed):
+    total = sum(row["frames"] for row in stats["streams"])
+    lines = [f"{elapsed:.0f}s  {total / elapsed if elapsed else 0:.1f} FPS total  "
+             f"batch {stats['avg_batch']:.1f}  infer {stats['infer_ms_per_batch']:.1f} ms/batch"]
+    for row in stats["streams"]:
+        lines.append(f"  {row['stream']:<12} {row['fps']:5.1f} FPS  "
+                     f"latency {row['latency_p50_ms']:.0f}/{row['latency_p95_ms']:.0f} ms  "
+                     f"drops {row['drops']}  cards {row['cards']}  seen {row['seen']}/52"
+                     + (f"  FAILED: {row['error']}" if row["error"] else ""))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch several tables with one batched model.")
+    parser.add_argument("sources", nargs="+",
+                        help="camera index, video file, image directory or synthetic[:seed], one per table")
+    parser.add_argument("--fps", type=float, help="replay rate for files / synthetic (default: the file's own)")
+    parser.add_argument("--fast", action="store_true", help="replay as fast as possible instead of in real time")
+    parser.add_argument("--loop", action="store_true", help="restart file / synthetic sources at the end")
+    parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    parser.add_argument("--max-batch", type=int, default=MULTISTREAM_MAX_BATCH,
+                        help=f"frames per model call; 1 = one call per stream (default: {MULTISTREAM_MAX_BATCH})")
+    parser.add_argument("--imgsz", type=int, help="inference size (default: runtime profile, else INFER_IMGSZ)")
+    parser.add_argument("--conf", type=float, default=INFER_CONF)
+    parser.add_argument("--backend", help="inference backend (default: runtime profile, else INFERENCE_BACKEND)")
+    parser.add_argument("--interval", type=float, default=MULTISTREAM_REPORT_INTERVAL,
+                        help="seconds between reports")
+    args = parser.parse_args()
+
+    from backends import load_backend
+
+    model = load_backend(args.backend)
+    streams = []
+    for i, spec in enumerate(args.sources):
+        stream = Stream(f"{i}:{spec}"[:12], spec, fps=args.fps, realtime=not args.fast, loop=args.loop)
+        if not stream.source.isOpened():
+            parser.error(f"could not open source {spec}")
+        streams.append(stream)
+
+    server = MultiStream(model, streams, imgsz=args.imgsz, conf=args.conf, max_batch=args.max_batch)
+    start = last_report = time.perf_counter()
+    server.start()
+    try:
+        while not server.finished:
+            server.step()
+            for stream in server.new_failures():
+                print(f"Stream {stream.name} failed: {stream.error}", flush=True)
+            now = time.perf_counter()
+            if args.duration and now - start >= args.duration:
+                break
+            if now - last_report >= args.interval:
+                last_report = now
+                print(format_report(server.stats(), now - start), flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    print(format_report(server.stats(), time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
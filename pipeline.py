@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import deque
+
+from config import PIPELINE_QUEUE_SIZE
+
+
+class LatestQueue:
+    # Bounded hand-off between stages. When full, the oldest item is
+    # dropped so consumers always see the freshest frame.
+
+    def __init__(self, maxsize=PIPELINE_QUEUE_SIZE):
+        self._items = deque()
+        self._maxsize = max(1, maxsize)
+        self._cond = threading.Condition()
+        self.closed = False
+        self.puts = 0
+        self.drops = 0
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self._maxsize:
+                self._items.popleft()
+                self.drops += 1
+            self._items.append(item)
+            self.puts += 1
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        with self._cond:
+            if not self._items and not self.closed:
+                self._cond.wait(timeout)
+            if self._items:
+                return self._items.popleft()
+            return None
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class Stage(threading.Thread):
+    # A source stage (inbox=None) calls fn() until it returns None.
+    # Other stages call fn(item); returning None drops the item.
+
+    def __init__(self, name, fn, inbox, outbox):
+        super().__init__(name=f"pipeline-{name}", daemon=True)
+        self.stage_name = name
+        self.fn = fn
+        self.inbox = inbox
+        self.outbox = outbox
+        self.processed = 0
+        self.busy = 0.0
+        self.error = None
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        try:
+            while not self._stop_event.is_set():
+                if self.inbox is None:
+                    item = None
+                else:
+                    item = self.inbox.get(timeout=0.1)
+                    if item is None:
+                        if self.inbox.closed:
+                            break
+                        continue
+
+                start = time.perf_counter()
+                out = self.fn() if self.inbox is None else self.fn(item)
+                self.busy += time.perf_counter() - start
+                self.processed += 1
+
+                if out is not None:
+                    self.outbox.put(out)
+                elif self.inbox is None:
+                    break
+        except Exception as e:
+            self.error = e
+        finally:
+            self.outbox.close()
+
+
+class FramePipeline:
+    # capture -> stage 1 -> ... -> stage N -> get(), each hop a LatestQueue.
+
+    def __init__(self, read_frame, stages, maxsize=PIPELINE_QUEUE_SIZE):
+        queues = [LatestQueue(maxsize) for _ in range(len(stages) + 1)]
+        self._stages = [Stage("capture", read_frame, None, queues[0])]
+        for i, (name, fn) in enumerate(stages):
+            self._stages.append(Stage(name, fn, queues[i], queues[i + 1]))
+        self._output = queues[-1]
+
+    def start(self):
+        for stage in self._stages:
+            stage.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        for stage in self._stages:
+            stage.stop()
+        for stage in self._stages:
+            stage.outbox.close()
+        for stage in self._stages:
+            if stage.is_alive():
+                stage.join(timeout)
+
+    def get(self, timeout=None):
+        return self._output.get(timeout)
+
+    @property
+    def closed(self):
+        return self._output.closed and not len(self._output)
+
+    @property
+    def error(self):
+        for stage in self._stages:
+            if stage.error is not None:
+                return stage.error
+        return None
+
+    def stats(self):
+        rows = []
+        for stage in self._stages:
+            row = {"stage": stage.stage_name, "processed": stage.processed,
+                   "avg_ms": stage.busy / stage.processed * 1000 if stage.processed else 0.0}
+            if stage.inbox is not None:
+                row["depth"] = len(stage.inbox)
+                row["drops"] = stage.inbox.drops
+            rows.append(row)
+        rows.append({"stage": "render", "depth": len(self._output), "drops": self._output.drops})
+        return rows
+
+
+def format_stats(rows):
+    parts = []
+    for row in rows:
+        text = row["stage"]
+        if "avg_ms" in row:
+            text += f" {row['avg_ms']:.1f}ms"
+        if "depth" in row:
+            text += f" q={row['depth']} drop={row['drops']}"
+        parts.append(text)
+    return " · ".join(parts)
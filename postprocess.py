@@ -0,0 +1,110 @@
+import cv2
+import numpy as np
+
+from config import SUIT_BGR
+
+
+class Detections:
+    # All boxes of one frame as contiguous arrays: xyxy (N, 4) int32,
+    # conf (N,) float32, cls (N,) int64, plus the model's class-name map.
+
+    def __init__(self, xyxy, conf, cls, names):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+        self.names = names
+
+    @classmethod
+    def empty(cls, names):
+        return cls(np.empty((0, 4), np.int32), np.empty(0, np.float32), np.empty(0, np.int64), names)
+
+    @classmethod
+    def from_result(cls, result, names=None):
+        names = result.names if names is None else names
+        data = result.boxes.data
+        # One device->host transfer for the whole (N, 6) x1,y1,x2,y2,conf,cls block
+        if hasattr(data, "cpu"):
+            data = data.cpu().numpy()
+        data = np.ascontiguousarray(data, dtype=np.float32)
+        if not len(data):
+            return cls.empty(names)
+        return cls(
+            data[:, :4].astype(np.int32),
+            data[:, 4].copy(),
+            data[:, 5].astype(np.int64),
+            names,
+        )
+
+    def __len__(self):
+        return len(self.conf)
+
+    def select(self, mask):
+        return Detections(self.xyxy[mask], self.conf[mask], self.cls[mask], self.names)
+
+    def scaled(self, factor):
+        # Boxes mapped onto a frame resized by `factor`
+        if factor == 1:
+            return self
+        return Detections((self.xyxy * factor).astype(np.int32), self.conf, self.cls, self.names)
+
+    @property
+    def labels(self):
+        return [self.names[c] for c in self.cls.tolist()]
+
+    def best_per_card(self):
+        # Highest confidence per class: sort by confidence, keep the first
+        # occurrence of each class id.
+        if not len(self):
+            return {}
+        order = np.argsort(-self.conf, kind="stable")
+        ids, first = np.unique(self.cls[order], return_index=True)
+        best = self.conf[order[first]]
+        return {self.names[c]: conf for c, conf in zip(ids.tolist(), best.tolist())}
+
+    def to_records(self):
+        return [
+            {"card": name, "conf": round(conf, 4), "box": box}
+            for name, conf, box in zip(self.labels, self.conf.tolist(), self.xyxy.tolist())
+        ]
+
+    def draw(self, frame, box_color=None, text_color=None):
+        # box_color=None colours each box by suit, like the web UI.
+        for name, conf, (x1, y1, x2, y2) in zip(self.labels, self.conf.tolist(), self.xyxy.tolist()):
+            color = box_color or SUIT_BGR.get(name[-1], (0, 255, 0))
+            label = f"{name} ({int(conf * 100)}%)"
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(frame, label, (x1, y1 - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, text_color or color, 2)
+        return frame
+
+
+def box_iou(a, b):
+    # Pairwise IoU of (N, 4) and (M, 4) xyxy arrays -> (N, M)
+    a = a.astype(np.float32)[:, None]
+    b = b.astype(np.float32)[None]
+    wh = np.clip(np.minimum(a[..., 2:], b[..., 2:]) - np.maximum(a[..., :2], b[..., :2]), 0, None)
+    inter = wh[..., 0] * wh[..., 1]
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-6)
+
+
+def agreement(reference, other, iou_threshold=0.5):
+    # Greedy same-class matching of other's boxes against reference's.
+    # Returns counts plus the largest confidence gap among matched pairs.
+    matched, max_conf_diff = 0, 0.0
+    if len(reference) and len(other):
+        iou = box_iou(reference.xyxy, other.xyxy)
+        iou[reference.cls[:, None] != other.cls[None]] = 0
+        for i in np.argsort(-reference.conf):
+            j = int(np.argmax(iou[i]))
+            if iou[i, j] >= iou_threshold:
+                matched += 1
+                max_conf_diff = max(max_conf_diff, abs(float(reference.conf[i] - other.conf[j])))
+                iou[:, j] = 0
+    return {
+        "reference": len(reference),
+        "other": len(other),
+        "matched": matched,
+        "max_conf_diff": max_conf_diff,
+    }
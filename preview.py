@@ -0,0 +1,62 @@
+import time
+
+import numpy as np
+
+from config import PREVIEW_FPS, PREVIEW_OVERLAY
+
+
+class Preview:
+    # The viewer's copy of a frame, built apart from inference. The model
+    # reads the native capture frame untouched; the preview is downscaled
+    # once into the encoder's reusable buffer and the boxes, scaled to it,
+    # are drawn there ("draw") or handed to the page as coordinates
+    # ("html"). fps caps how many previews are built and encoded,
+    # independently of the inference rate.
+
+    def __init__(self, encoder, fps=PREVIEW_FPS, overlay=PREVIEW_OVERLAY):
+        if overlay not in ("draw", "html"):
+            raise ValueError(f"Unknown preview overlay {overlay!r}; expected 'draw' or 'html'")
+        self.encoder = encoder
+        self.interval = 1.0 / fps if fps else 0.0
+        self.overlay = overlay
+        self.skipped = 0
+        self._next = 0.0
+        self._copy = None
+
+    def due(self):
+        now = time.perf_counter()
+        if now < self._next:
+            self.skipped += 1
+            return False
+        self._next = now + self.interval
+        return True
+
+    def render(self, frame, detections, draw=None, writable=False):
+        # writable: the caller draws on the result too (metrics overlay)
+        draw = self.overlay == "draw" if draw is None else draw
+        preview = self.encoder.resize(frame)
+        if preview is frame and (writable or (draw and len(detections))):
+            # Already preview-sized: copy into our own buffer rather than
+            # drawing on the capture frame
+            if self._copy is None or self._copy.shape != frame.shape or self._copy.dtype != frame.dtype:
+                self._copy = np.empty_like(frame)
+            np.copyto(self._copy, frame)
+            preview = self._copy
+        if draw and len(detections):
+            detections.scaled(preview.shape[1] / frame.shape[1]).draw(preview)
+        return preview
+
+
+def box_coords(detections, frame_shape):
+    # Boxes as percentages of the frame, for the page to draw over the image
+    height, width = frame_shape[:2]
+    xywh = detections.xyxy.astype(np.float32)
+    xywh[:, 2:] -= xywh[:, :2]
+    boxes = (xywh / [width, height, width, height] * 100).round(1)
+    return {
+        "aspect": round(width / height, 4),
+        "boxes": [
+            {"card": name, "conf": round(conf, 2), "box": box}
+            for name, conf, box in zip(detections.labels, detections.conf.tolist(), boxes.tolist())
+        ],
+    }
@@ -0,0 +1,157 @@
+import argparse
+import json
+import os
+import re
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from backends import export_model, exported_path, load_backend
+from config import INFER_CONF, INFER_IMGSZ, MODEL_PATH
+from postprocess import Detections, agreement
+from synthetic import make_scenes
+
+
+def letterbox(frame_bgr, imgsz):
+    # Same preprocessing as ultralytics: aspect-preserving resize, grey pad,
+    # RGB, CHW, float32 in [0, 1], with a leading batch dimension.
+    h, w = frame_bgr.shape[:2]
+    scale = min(imgsz / h, imgsz / w)
+    nh, nw = round(h * scale), round(w * scale)
+    canvas = np.full((imgsz, imgsz, 3), 114, np.uint8)
+    top, left = (imgsz - nh) // 2, (imgsz - nw) // 2
+    canvas[top:top + nh, left:left + nw] = cv2.resize(frame_bgr, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    blob = cv2.cvtColor(canvas, cv2.COLOR_BGR2RGB).transpose(2, 0, 1)
+    return np.ascontiguousarray(blob[None], dtype=np.float32) / 255.0
+
+
+class SyntheticCalibrationReader:
+    # onnxruntime CalibrationDataReader over synthetic scenes from assets/cards
+
+    def __init__(self, input_name, frames, imgsz=INFER_IMGSZ):
+        self._input_name = input_name
+        self._frames = frames
+        self._imgsz = imgsz
+        self._index = 0
+
+    def get_next(self):
+        if self._index >= len(self._frames):
+            return None
+        blob = letterbox(self._frames[self._index], self._imgsz)
+        self._index += 1
+        return {self._input_name: blob}
+
+    def rewind(self):
+        self._index = 0
+
+
+def _head_nodes(onnx_model):
+    # Nodes of the last "/model.N/" block (the Detect head). Box decoding is
+    # sensitive to INT8 rounding, so it stays in FP32.
+    indices = [int(m.group(1)) for node in onnx_model.graph.node
+               if (m := re.match(r"/model\.(\d+)/", node.name))]
+    if not indices:
+        return []
+    prefix = f"/model.{max(indices)}/"
+    return [node.name for node in onnx_model.graph.node if node.name.startswith(prefix)]
+
+
+def quantize(model_path=MODEL_PATH, calibration_frames=200, imgsz=INFER_IMGSZ, seed=0):
+    import onnx
+    import onnxruntime as ort
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    fp32_path = export_model("onnx", model_path, imgsz=imgsz)
+    int8_path = exported_path("onnx-int8", model_path)
+
+    input_name = ort.InferenceSession(fp32_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    frames = [frame for frame, _ in make_scenes(calibration_frames, seed=seed)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        prepped = os.path.join(tmp, "prepped.onnx")
+        quant_pre_process(fp32_path, prepped, skip_symbolic_shape=True)
+        quantize_static(
+            prepped, int8_path,
+            SyntheticCalibrationReader(input_name, frames, imgsz),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+            calibrate_method=CalibrationMethod.MinMax,
+            nodes_to_exclude=_head_nodes(onnx.load(prepped)),
+        )
+    return fp32_path, int8_path
+
+
+def compare(model_path=MODEL_PATH, eval_frames=200, imgsz=INFER_IMGSZ, conf=INFER_CONF, seed=1):
+    # Per-card agreement of INT8 against FP32 ONNX, plus latency of both
+    models = {"fp32": load_backend("onnx", model_path, profile_path=None),
+              "int8": load_backend("onnx-int8", model_path, profile_path=None)}
+    scenes = make_scenes(eval_frames, seed=seed)
+    for model in models.values():
+        model(scenes[0][0], imgsz=imgsz, conf=conf, verbose=False)  # warm-up
+
+    per_card = {}
+    latency = {name: [] for name in models}
+    for frame, _ in scenes:
+        out = {}
+        for name, model in models.items():
+            start = time.perf_counter()
+            out[name] = Detections.from_result(model(frame, imgsz=imgsz, conf=conf, verbose=False)[0])
+            latency[name].append((time.perf_counter() - start) * 1000)
+
+        ref, q = out["fp32"], out["int8"]
+        for cls_id in np.union1d(ref.cls, q.cls).tolist():
+            result = agreement(ref.select(ref.cls == cls_id), q.select(q.cls == cls_id))
+            card = per_card.setdefault(ref.names[cls_id], {"fp32": 0, "int8": 0, "matched": 0})
+            card["fp32"] += result["reference"]
+            card["int8"] += result["other"]
+            card["matched"] += result["matched"]
+
+    for card in per_card.values():
+        card["agreement"] = card["matched"] / max(card["fp32"], card["int8"], 1)
+    totals = {key: sum(card[key] for card in per_card.values()) for key in ("fp32", "int8", "matched")}
+
+    return {
+        "frames": eval_frames,
+        "imgsz": imgsz,
+        "conf": conf,
+        "agreement": totals["matched"] / max(totals["fp32"], totals["int8"], 1),
+        "detections": totals,
+        "latency_ms": {
+            name: {"p50": float(np.percentile(v, 50)), "p95": float(np.percentile(v, 95))}
+            for name, v in latency.items()
+        },
+        "per_card": dict(sorted(per_card.items())),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build an INT8 ONNX model calibrated on synthetic card scenes.")
+    parser.add_argument("--calibration-frames", type=int, default=200)
+    parser.add_argument("--eval-frames", type=int, default=200)
+    parser.add_argument("--imgsz", type=int, default=INFER_IMGSZ)
+    parser.add_argument("--report", default=os.path.splitext(MODEL_PATH)[0] + "_int8_report.json")
+    args = parser.parse_args()
+
+    fp32_path, int8_path = quantize(calibration_frames=args.calibration_frames, imgsz=args.imgsz)
+    print(f"Quantized {fp32_path} -> {int8_path}")
+
+    report = compare(eval_frames=args.eval_frames, imgsz=args.imgsz)
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+
+    lat = report["latency_ms"]
+    print(f"Agreement with FP32: {report['agreement']:.1%} over {report['frames']} frames")
+    print(f"Latency p50: fp32 {lat['fp32']['p50']:.1f} ms, int8 {lat['int8']['p50']:.1f} ms")
+    worst = sorted(report["per_card"].items(), key=lambda kv: kv[1]["agreement"])[:5]
+    print("Lowest per-card agreement: " + ", ".join(f"{c} {v['agreement']:.0%}" for c, v in worst))
+    print(f"Report: {args.report}")
+    print('Use it with INFERENCE_BACKEND = "onnx-int8" in config.py')
+
+
+if __name__ == "__main__":
+    main()
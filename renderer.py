@@ -1,154 +1,135 @@
-import streamlit as st
+from functools import lru_cache
 
-from config import SUITS, RANKS, CARD_VALUES, suit_key_to_name
-from detection import CARD_IMAGES
+from config import SUITS, RANKS, CARD_VALUES, GLOW_LEVELS, suit_key_to_name
 from styles import CSS_COMMON, CSS_ICONS, CSS_IMAGES
 
 
-def _hex_alpha(a):
-    return format(max(0, min(255, int(a * 255))), "02x")
+def _suit_header(suit_key, info, suit_count):
+    return (
+        f'<div class="suit-title" data-suit="{suit_key}" style="color:{info["color"]}">'
+        f'{info["symbol"]} {suit_key_to_name(suit_key)} ({suit_count}/13)</div>'
+    )
 
 
-def _intensity_styles(glow_color, intensity):
-    r1 = int(6 + 10 * intensity)
-    r2 = int(12 + 20 * intensity)
-    alpha = round(intensity, 2)
+def _glow_classes(suit_key, level, is_popping):
+    return f"card glow-{suit_key}-{level}" + (" pop" if is_popping else "")
 
-    anim_name = f"gp{int(intensity * 1000)}"
-    lo1, lo2 = int(r1 * 0.6), int(r2 * 0.6)
-    hi1, hi2 = r1, r2
 
-    keyframes = (
-        f"@keyframes {anim_name} {{"
-        f"  0%,100% {{ box-shadow: 0 0 {lo1}px {glow_color}{_hex_alpha(alpha)}, "
-        f"0 0 {lo2}px {glow_color}{_hex_alpha(alpha * 0.5)}; }}"
-        f"  50% {{ box-shadow: 0 0 {hi1}px {glow_color}{_hex_alpha(alpha)}, "
-        f"0 0 {hi2}px {glow_color}{_hex_alpha(alpha * 0.7)}; }}"
-        f"}}"
+@lru_cache(maxsize=4096)
+def _icon_fragment(suit_key, rank, level, is_popping, seen):
+    info = SUITS[suit_key]
+    card_id = f"{rank}{suit_key}"
+
+    if level:
+        bar_width = int(level / GLOW_LEVELS * 100)
+        return (
+            f'<div class="{_glow_classes(suit_key, level, is_popping)}" data-card="{card_id}">'
+            f'<span class="rank">{rank}</span>'
+            f'<span class="suit" style="color:{info["color"]}">{info["symbol"]}</span>'
+            f'<div class="conf-bar" style="width:calc({bar_width}% - 6px);background:{info["glow"]}"></div>'
+            f'</div>'
+        )
+    if seen:
+        return (
+            f'<div class="card" data-card="{card_id}" style="border-color:{info["color"]};color:#aaa;background:#151530;">'
+            f'<span class="rank">{rank}</span>'
+            f'<span class="suit" style="color:{info["color"]};opacity:0.5">{info["symbol"]}</span>'
+            f'</div>'
+        )
+    return (
+        f'<div class="card" data-card="{card_id}">'
+        f'<span class="rank">{rank}</span>'
+        f'<span class="suit">{info["symbol"]}</span>'
+        f'</div>'
     )
 
-    style = (
-        f"border-color: {glow_color}; "
-        f"color: rgba(255,255,255,{alpha}); "
-        f"background: #1a1a3e; "
+
+@lru_cache(maxsize=4096)
+def _image_fragment(suit_key, rank, level, is_popping, seen):
+    info = SUITS[suit_key]
+    is_red = suit_key in ("H", "D")
+    card_id = f"{rank}{suit_key}"
+    art = f'<div class="art art-{card_id}" role="img" aria-label="{card_id}"></div>'
+
+    if level:
+        bar_width = int(level / GLOW_LEVELS * 100)
+        return (
+            f'<div class="{_glow_classes(suit_key, level, is_popping)}" data-card="{card_id}">'
+            f'{art}'
+            f'<div class="conf-bar" style="width:calc({bar_width}% - 4px);background:{info["glow"]}"></div>'
+            f'</div>'
+        )
+    if seen:
+        seen_cls = "seen-red" if is_red else "seen"
+        return (
+            f'<div class="card {seen_cls}" data-card="{card_id}" style="border-color:{info["color"]};background:#151530;">'
+            f'{art}'
+            f'</div>'
+        )
+    dim_cls = "dim-red" if is_red else "dim"
+    return (
+        f'<div class="card {dim_cls}" data-card="{card_id}">'
+        f'{art}'
+        f'</div>'
     )
 
-    return keyframes, style, alpha, anim_name
 
+_FRAGMENTS = {"icons": _icon_fragment, "images": _image_fragment}
 
-def _suit_header(suit_key, info):
-    ever = st.session_state.get("ever_detected", set())
-    suit_count = sum(1 for r in RANKS if f"{r}{suit_key}" in ever)
-    return (
-        f'<div class="suit-title" style="color:{info["color"]}">'
-        f'{info["symbol"]} {suit_key_to_name(suit_key)} ({suit_count}/13)</div>'
-    )
+# (style, suit) -> (card keys, html) of the last composition
+_suit_cache = {}
 
 
-def render_suit_icons(suit_key, card_states):
-    info = SUITS[suit_key]
-    html = CSS_COMMON + CSS_ICONS
-    extra_keyframes = ""
-    ever = st.session_state.get("ever_detected", set())
-    html += _suit_header(suit_key, info)
-    html += '<div class="card-grid">'
-
-    for rank in RANKS:
-        card_id = f"{rank}{suit_key}"
-        state = card_states.get(card_id)
-
-        if state and state[0] > 0.01:
-            intensity, is_popping = state
-            keyframes, style, alpha, anim_name = _intensity_styles(info["glow"], intensity)
-            extra_keyframes += keyframes
-
-            if is_popping:
-                style += f"animation: {anim_name} 1.8s ease-in-out infinite, card-pop 0.35s ease-out; "
-            else:
-                style += f"animation: {anim_name} 1.8s ease-in-out infinite; "
-
-            suit_color = info["color"]
-            bar_width = int(intensity * 100)
-            html += (
-                f'<div class="card" style="{style}">'
-                f'<span class="rank">{rank}</span>'
-                f'<span class="suit" style="color:{suit_color};opacity:{alpha}">{info["symbol"]}</span>'
-                f'<div class="conf-bar" style="width:calc({bar_width}% - 6px);background:{info["glow"]}"></div>'
-                f'</div>'
-            )
-        elif card_id in ever:
-            html += (
-                f'<div class="card" style="border-color:{info["color"]};color:#aaa;background:#151530;">'
-                f'<span class="rank">{rank}</span>'
-                f'<span class="suit" style="color:{info["color"]};opacity:0.5">{info["symbol"]}</span>'
-                f'</div>'
-            )
-        else:
-            html += (
-                f'<div class="card">'
-                f'<span class="rank">{rank}</span>'
-                f'<span class="suit">{info["symbol"]}</span>'
-                f'</div>'
-            )
-
-    html += '</div>'
-    if extra_keyframes:
-        html = f"<style>{extra_keyframes}</style>" + html
-    return html
+def _render_suit(style_name, css, fragment, suit_key, cards):
+    # Per-card keys (glow level, popping, seen) come straight from the
+    # tracker's arrays; intensity is already quantized to GLOW_LEVELS
+    keys = cards.suit_keys(suit_key)
+    header = _suit_header(suit_key, SUITS[suit_key], cards.seen_count(suit_key))
 
+    cached = _suit_cache.get((style_name, suit_key))
+    if cached is not None and cached[0] == (header, keys):
+        return cached[1]
 
-def render_suit_images(suit_key, card_states):
-    info = SUITS[suit_key]
-    is_red = suit_key in ("H", "D")
-    html = CSS_COMMON + CSS_IMAGES
-    extra_keyframes = ""
-    ever = st.session_state.get("ever_detected", set())
-    html += _suit_header(suit_key, info)
-    html += '<div class="card-grid">'
-
-    for rank in RANKS:
-        card_id = f"{rank}{suit_key}"
-        img_src = CARD_IMAGES.get(card_id, "")
-        state = card_states.get(card_id)
-
-        if state and state[0] > 0.01:
-            intensity, is_popping = state
-            keyframes, style, alpha, anim_name = _intensity_styles(info["glow"], intensity)
-            extra_keyframes += keyframes
-
-            if is_popping:
-                style += f"animation: {anim_name} 1.8s ease-in-out infinite, card-pop 0.35s ease-out; "
-            else:
-                style += f"animation: {anim_name} 1.8s ease-in-out infinite; "
-
-            bar_width = int(intensity * 100)
-            html += (
-                f'<div class="card" style="{style}">'
-                f'<img src="{img_src}" alt="{card_id}">'
-                f'<div class="conf-bar" style="width:calc({bar_width}% - 4px);background:{info["glow"]}"></div>'
-                f'</div>'
-            )
-        elif card_id in ever:
-            seen_cls = "seen-red" if is_red else "seen"
-            html += (
-                f'<div class="card {seen_cls}" style="border-color:{info["color"]};background:#151530;">'
-                f'<img src="{img_src}" alt="{card_id}">'
-                f'</div>'
-            )
-        else:
-            dim_cls = "dim-red" if is_red else "dim"
-            html += (
-                f'<div class="card {dim_cls}">'
-                f'<img src="{img_src}" alt="{card_id}">'
-                f'</div>'
-            )
-
-    html += '</div>'
-    if extra_keyframes:
-        html = f"<style>{extra_keyframes}</style>" + html
+    grid = "".join(fragment(suit_key, rank, *key) for rank, key in zip(RANKS, keys))
+    html = css + header + '<div class="card-grid">' + grid + '</div>'
+    _suit_cache[(style_name, suit_key)] = ((header, keys), html)
     return html
 
 
+def render_suit_icons(suit_key, cards):
+    return _render_suit("icons", CSS_COMMON + CSS_ICONS, _icon_fragment, suit_key, cards)
+
+
+def render_suit_images(suit_key, cards):
+    return _render_suit("images", CSS_COMMON + CSS_IMAGES, _image_fragment, suit_key, cards)
+
+
+def render_card(style_name, card_id, level, is_popping, seen):
+    # One card's fragment ("icons" / "images"), for patching a single card
+    return _FRAGMENTS[style_name](card_id[-1], card_id[:-1], level, is_popping, seen)
+
+
+def render_suit_title(suit_key, suit_count):
+    return _suit_header(suit_key, SUITS[suit_key], suit_count)
+
+
+def render_camera_frame(img_str, overlay=None):
+    img = f'<img src="data:image/jpeg;base64,{img_str}" alt="Camera feed" />'
+    if not overlay:
+        return f'<div class="camera-container">{img}</div>'
+    # Boxes as percentages of the frame; the container takes the frame's
+    # aspect ratio so they line up with the image at any display size
+    boxes = []
+    for box in overlay["boxes"]:
+        x, y, w, h = box["box"]
+        color = SUITS.get(box["card"][-1], {}).get("color", "#4caf50")
+        boxes.append(
+            f'<div class="preview-box" style="left:{x}%;top:{y}%;width:{w}%;height:{h}%;border-color:{color}">'
+            f'<span style="background:{color}">{box["card"]} {int(box["conf"] * 100)}%</span></div>'
+        )
+    return f'<div class="camera-container" style="aspect-ratio:{overlay["aspect"]}">{img}{"".join(boxes)}</div>'
+
+
 def render_info_panel(side="left"):
     # Shared styles
     box = "background:#12122a;border-radius:10px;padding:20px;margin-bottom:16px;border:1px solid #252550;"
@@ -261,18 +242,14 @@ def render_info_panel(side="left"):
 </div>'''
 
 
-def render_progress_bar(card_states=None, is_running=False):
-    count = len(st.session_state.get("ever_detected", set()))
-    pct = int(count / 52 * 100)
-    
-    # Determine status message
+def progress_status(cards=None, is_running=False):
     if not is_running:
         status = "Waiting for cards…"
-    elif not card_states or not any(state and state[0] > 0.01 for state in card_states.values()):
+    elif cards is None or not len(cards.active_confidences()):
         status = "Detecting…"
     else:
         # Calculate average confidence from active detections
-        active_confidences = [state[0] for state in card_states.values() if state and state[0] > 0.01]
+        active_confidences = cards.active_confidences().tolist()
         if active_confidences:
             avg_confidence = sum(active_confidences) / len(active_confidences)
             if avg_confidence < 0.7:
@@ -281,9 +258,18 @@ def render_progress_bar(card_states=None, is_running=False):
                 status = "Stable detection"
         else:
             status = "Detecting…"
-    
+    return status
+
+
+def render_progress_bar(cards=None, is_running=False):
+    count = cards.seen_count() if cards is not None else 0
+    return render_progress(count, progress_status(cards, is_running))
+
+
+def render_progress(count, status):
+    pct = int(count / 52 * 100)
     return f'''
-    <div style="background:#1a1a2e;border-radius:6px;height:22px;position:relative;
+    <div data-sync="progress" style="background:#1a1a2e;border-radius:6px;height:22px;position:relative;
                 border:1px solid #333;margin-bottom:4px;overflow:hidden;">
         <div style="width:{pct}%;height:100%;border-radius:5px;
                     background:linear-gradient(90deg,#2e7d32,#1565c0);
@@ -299,7 +285,7 @@ def render_progress_bar(card_states=None, is_running=False):
 def render_card_sum(current_detections):
     if not current_detections:
         return '''
-        <div style="background:#12122a;border-radius:8px;padding:10px 14px;
+        <div data-sync="sum" style="background:#12122a;border-radius:8px;padding:10px 14px;
                     border:1px solid #252550;margin-top:6px;text-align:center;">
             <span style="color:#555;font-size:13px;">Show cards to the camera to calculate</span>
         </div>'''
@@ -331,7 +317,7 @@ def render_card_sum(current_detections):
         )
 
     return f'''
-    <div style="background:#12122a;border-radius:8px;padding:10px 14px;
+    <div data-sync="sum" style="background:#12122a;border-radius:8px;padding:10px 14px;
                 border:1px solid #252550;margin-top:6px;">
         <div style="display:flex;align-items:center;justify-content:space-between;margin-bottom:8px;">
             <span style="color:#c0c0d0;font-size:13px;font-weight:600;">Cards in Frame</span>
@@ -0,0 +1,279 @@
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from backends import load_backend, model_imgsz, warm_up
+from config import (
+    INFER_CONF, METRICS_WINDOW, SERVICE_HOST, SERVICE_MAX_BATCH, SERVICE_MAX_QUEUE, SERVICE_MAX_WAIT_MS,
+    SERVICE_PORT, SERVICE_SOCKET,
+)
+from postprocess import Detections
+
+MAX_BODY = 16 * 1024 * 1024
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+
+
+class Overloaded(Exception):
+    pass
+
+
+class Batcher:
+    # Collects concurrent detect() calls into micro-batches. The first
+    # request of a batch waits up to max_wait for company, then everything
+    # queued (up to max_batch) goes through the model in one call on the
+    # inference thread. More than max_queue requests waiting or in flight
+    # raises Overloaded, so callers get a fast 503 instead of a growing
+    # queue and unbounded latency.
+
+    def __init__(self, model, max_batch=SERVICE_MAX_BATCH, max_wait_ms=SERVICE_MAX_WAIT_MS,
+                 max_queue=SERVICE_MAX_QUEUE, imgsz=None, conf=INFER_CONF, window=METRICS_WINDOW):
+        self.model = model
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self.imgsz = imgsz or model_imgsz(model)
+        self.conf = conf
+        self._pending = deque()
+        self._wakeup = asyncio.Event()
+        self._inference = ThreadPoolExecutor(1, thread_name_prefix="service-inference")
+        self._in_flight = 0
+        self._task = None
+        self.requests = 0
+        self.rejected = 0
+        self.batches = 0
+        self.max_depth = 0
+        self.batch_sizes = deque(maxlen=window)
+        self.infer_ms = deque(maxlen=window)
+        self.latency_ms = deque(maxlen=window)
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        self._inference.shutdown(wait=False)
+
+    @property
+    def depth(self):
+        return len(self._pending) + self._in_flight
+
+    async def detect(self, frame):
+        if self.depth >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded()
+        self.requests += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((frame, future, time.perf_counter()))
+        self.max_depth = max(self.max_depth, self.depth)
+        self._wakeup.set()
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            # Let the batch fill for up to max_wait after its first request
+            deadline = loop.time() + self.max_wait
+            while len(self._pending) < self.max_batch and loop.time() < deadline:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), deadline - loop.time())
+                except asyncio.TimeoutError:
+                    break
+
+            batch = [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+            self._in_flight = len(batch)
+            try:
+                start = time.perf_counter()
+                results = await loop.run_in_executor(self._inference, self._infer, [f for f, _, _ in batch])
+                self.infer_ms.append((time.perf_counter() - start) * 1000)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finally:
+                self._in_flight = 0
+
+            self.batches += 1
+            self.batch_sizes.append(len(batch))
+            done = time.perf_counter()
+            for (_, future, queued), detections in zip(batch, results):
+                self.latency_ms.append((done - queued) * 1000)
+                if not future.done():
+                    future.set_result(detections)
+
+    def _infer(self, frames):
+        results = self.model(frames, imgsz=self.imgsz, conf=self.conf, verbose=False)
+        return [Detections.from_result(result, self.model.names) for result in results]
+
+    def stats(self):
+        sizes = np.fromiter(self.batch_sizes, float)
+        latency = np.fromiter(self.latency_ms, float)
+        p50, p95, p99 = np.percentile(latency, [50, 95, 99]) if len(latency) else (0.0, 0.0, 0.0)
+        return {
+            "requests": self.requests,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "queue_depth": self.depth,
+            "max_queue_depth": self.max_depth,
+            "max_queue": self.max_queue,
+            "avg_batch_size": float(sizes.mean()) if len(sizes) else 0.0,
+            "batch_size_histogram": {str(int(k)): int(v) for k, v in zip(*np.unique(sizes, return_counts=True))},
+            "infer_ms_per_batch": float(np.mean(self.infer_ms)) if self.infer_ms else 0.0,
+            "latency_ms": {"p50": float(p50), "p95": float(p95), "p99": float(p99)},
+        }
+
+
+async def _read_request(reader):
+    # -> (method, path, headers, body) or None when the client went away
+    line = await reader.readline()
+    if not line:
+        return None
+    parts = line.decode("latin-1").split()
+    if len(parts) != 3:
+        raise ValueError("malformed request line")
+    method, path, _ = parts
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    body = b""
+    if method == "POST":
+        if "content-length" not in headers:
+            return method, path, headers, None
+        length = int(headers["content-length"])
+        if length > MAX_BODY:
+            raise OverflowError()
+        body = await reader.readexactly(length)
+    return method, path.split("?")[0], headers, body
+
+
+def _response(status, payload, keep_alive=True, extra_headers=()):
+    body = json.dumps(payload).encode()
+    head = [f"HTTP/1.1 {status} {REASONS[status]}", "Content-Type: application/json",
+            f"Content-Length: {len(body)}", f"Connection: {'keep-alive' if keep_alive else 'close'}",
+            *extra_headers]
+    return ("\r\n".join(head) + "\r\n\r\n").encode() + body
+
+
+class DetectionService:
+    # Headless HTTP front end for Batcher, over TCP or a Unix socket:
+    #   POST /detect   body: an encoded image (JPEG / PNG)
+    #                  -> {"cards": {card_id: conf}, "detections": [...], "latency_ms": ...}
+    #   GET  /stats    queue depth, batch sizes, latency percentiles
+    #   GET  /health
+
+    def __init__(self, batcher):
+        self.batcher = batcher
+
+    async def serve(self, host=SERVICE_HOST, port=SERVICE_PORT, socket_path=SERVICE_SOCKET):
+        self.batcher.start()
+        if socket_path:
+            server = await asyncio.start_unix_server(self._handle, path=socket_path)
+        else:
+            server = await asyncio.start_server(self._handle, host, port)
+        return server
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except OverflowError:
+                    writer.write(_response(413, {"error": "body too large"}, keep_alive=False))
+                    break
+                except (ValueError, asyncio.IncompleteReadError):
+                    writer.write(_response(400, {"error": "malformed request"}, keep_alive=False))
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(await self._route(method, path, body, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, path, body, keep_alive):
+        if path == "/health":
+            return _response(200, {"ok": True}, keep_alive)
+        if path == "/stats":
+            return _response(200, self.batcher.stats(), keep_alive)
+        if path != "/detect":
+            return _response(404, {"error": "not found"}, keep_alive)
+        if method != "POST":
+            return _response(405, {"error": "POST an encoded image"}, keep_alive)
+        if body is None:
+            return _response(411, {"error": "Content-Length required"}, keep_alive)
+
+        start = time.perf_counter()
+        frame = await asyncio.get_running_loop().run_in_executor(
+            None, cv2.imdecode, np.frombuffer(body, np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            return _response(400, {"error": "could not decode image"}, keep_alive)
+        try:
+            detections = await self.batcher.detect(frame)
+        except Overloaded:
+            return _response(503, {"error": "overloaded", "queue_depth": self.batcher.depth},
+                             keep_alive, ["Retry-After: 1"])
+        except Exception as e:
+            # Inference failed for the whole batch; the service keeps serving
+            return _response(500, {"error": f"inference failed: {e}"}, keep_alive)
+        return _response(200, {
+            "cards": detections.best_per_card(),
+            "detections": detections.to_records(),
+            "latency_ms": round((time.perf_counter() - start) * 1000, 2),
+        }, keep_alive)
+
+
+async def _main(args):
+    model = warm_up(load_backend(args.backend))
+    batcher = Batcher(model, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms,
+                      max_queue=args.max_queue, imgsz=args.imgsz)
+    server = await DetectionService(batcher).serve(args.host, args.port, args.socket)
+    where = args.socket or f"http://{args.host}:{args.port}"
+    print(f"Detection service on {where} (batch <= {batcher.max_batch}, wait {args.max_wait_ms:g} ms, "
+          f"queue <= {batcher.max_queue})", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless card detection service with micro-batching.")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--socket", default=SERVICE_SOCKET, help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--max-batch", type=int, default=SERVICE_MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=SERVICE_MAX_WAIT_MS)
+    parser.add_argument("--max-queue", type=int, default=SERVICE_MAX_QUEUE)
+    parser.add_argument("--imgsz", type=int, help="inference size (default: runtime profile, else INFER_IMGSZ)")
+    parser.add_argument("--backend", help="inference backend (default: runtime profile, else INFERENCE_BACKEND)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
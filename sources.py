@@ -0,0 +1,212 @@
+import os
+import time
+
+import cv2
+import numpy as np
+
+from config import CAPTURE_HEIGHT, CAPTURE_WIDTH, SOURCE_RING_SIZE
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+class FrameRing:
+    # Preallocated frame slots reused round-robin. A frame handed out stays
+    # valid until `size` more frames have been read, which must exceed the
+    # number of frames a consumer keeps in flight.
+
+    def __init__(self, size):
+        self.size = size
+        self._slots = None
+        self._index = 0
+
+    def next_slot(self, shape):
+        if self._slots is None or self._slots.shape[1:] != shape:
+            self._slots = np.empty((self.size, *shape), np.uint8)
+        slot = self._slots[self._index]
+        self._index = (self._index + 1) % self.size
+        return slot
+
+
+class FrameSource:
+    # cv2.VideoCapture-style interface (read / isOpened / release) shared by
+    # every source. With fps set and realtime=True, read() paces frames on a
+    # fixed schedule; with realtime=False frames come as fast as possible.
+    # Either way `timestamp` follows the source's own timeline (start + n/fps)
+    # so replays drive fade / pop timing exactly like the recorded session.
+
+    live = False
+
+    def __init__(self, fps=None, realtime=True, ring_size=SOURCE_RING_SIZE):
+        self.fps = fps
+        self.realtime = realtime
+        self.ring = FrameRing(ring_size) if ring_size else None
+        self.frame_index = 0
+        self.timestamp = None
+        self._start = None
+
+    def _read(self):
+        # -> (ok, frame) for the next frame, like cv2.VideoCapture.read().
+        # Subclasses either implement this and let read() pace frames and
+        # copy them into the ring, or override read() itself (_CaptureSource).
+        raise NotImplementedError(f"{type(self).__name__} must implement _read() or read()")
+
+    def _pace(self):
+        if self._start is None:
+            self._start = time.time()
+        if self.live or not self.fps:
+            self.timestamp = time.time()
+            return
+        self.timestamp = self._start + self.frame_index / self.fps
+        if self.realtime:
+            delay = self.timestamp - time.time()
+            if delay > 0:
+                time.sleep(delay)
+
+    def read(self):
+        self._pace()
+        ok, frame = self._read()
+        if not ok:
+            return False, None
+        if self.ring is not None:
+            slot = self.ring.next_slot(frame.shape)
+            if slot is not frame:
+                np.copyto(slot, frame)
+            frame = slot
+        self.frame_index += 1
+        return True, frame
+
+    def __iter__(self):
+        while True:
+            ok, frame = self.read()
+            if not ok:
+                return
+            yield self.frame_name(), frame
+
+    def frame_name(self):
+        return str(self.frame_index - 1)
+
+    def isOpened(self):
+        return True
+
+    def release(self):
+        pass
+
+
+class _CaptureSource(FrameSource):
+    def __init__(self, cap, **kwargs):
+        super().__init__(**kwargs)
+        self.cap = cap
+
+    def read(self):
+        self._pace()
+        out = None
+        if self.ring is not None and self.ring._slots is not None:
+            out = self.ring.next_slot(self.ring._slots.shape[1:])
+        ok, frame = self.cap.read(out) if out is not None else self.cap.read()
+        if not ok:
+            return False, None
+        if self.ring is not None and frame is not out:
+            # First frame (or a size change): allocate the ring, then copy
+            slot = self.ring.next_slot(frame.shape)
+            np.copyto(slot, frame)
+            frame = slot
+        self.frame_index += 1
+        return True, frame
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def release(self):
+        self.cap.release()
+
+
+class CameraSource(_CaptureSource):
+    live = True
+
+    def __init__(self, device=0, width=CAPTURE_WIDTH, height=CAPTURE_HEIGHT, fps=None, **kwargs):
+        cap = cv2.VideoCapture(device)
+        if fps:
+            cap.set(cv2.CAP_PROP_FPS, fps)
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        super().__init__(cap, fps=fps, **kwargs)
+
+
+class VideoSource(_CaptureSource):
+    def __init__(self, path, fps=None, loop=False, **kwargs):
+        cap = cv2.VideoCapture(path)
+        fps = fps or cap.get(cv2.CAP_PROP_FPS) or 30.0
+        super().__init__(cap, fps=fps, **kwargs)
+        self.path = path
+        self.loop = loop
+
+    def read(self):
+        ok, frame = super().read()
+        if not ok and self.loop and self.frame_index:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = super().read()
+        return ok, frame
+
+
+class ImageDirSource(FrameSource):
+    def __init__(self, path, fps=None, loop=False, **kwargs):
+        super().__init__(fps=fps, **kwargs)
+        self.files = [os.path.join(path, f) for f in sorted(os.listdir(path))
+                      if f.lower().endswith(IMAGE_EXTENSIONS)]
+        self.loop = loop
+
+    def _read(self):
+        # Unreadable files are skipped; a whole pass without a readable one
+        # ends the source, looping or not
+        for _ in range(len(self.files)):
+            if self.frame_index >= len(self.files) and not self.loop:
+                return False, None
+            frame = cv2.imread(self.files[self.frame_index % len(self.files)])
+            if frame is not None:
+                return True, frame
+            self.frame_index += 1
+        return False, None
+
+    def frame_name(self):
+        return os.path.basename(self.files[(self.frame_index - 1) % len(self.files)])
+
+    def isOpened(self):
+        return bool(self.files)
+
+
+class SyntheticSource(FrameSource):
+    # Deterministic synthetic table: `scenes` random layouts from
+    # assets/cards, each held for `hold` frames, repeated `loops` times
+    # (None = forever).
+
+    def __init__(self, seed=0, scenes=20, hold=15, loops=None, fps=30.0, **kwargs):
+        super().__init__(fps=fps, **kwargs)
+        from synthetic import make_scenes
+
+        self.scenes = [frame for frame, _ in make_scenes(scenes, seed=seed)]
+        self.hold = hold
+        self.loops = loops
+
+    def _read(self):
+        scene = self.frame_index // self.hold
+        if self.loops is not None and scene >= len(self.scenes) * self.loops:
+            return False, None
+        frame = self.scenes[scene % len(self.scenes)]
+        # Callers draw on frames; the ring already hands out a copy
+        return True, frame if self.ring is not None else frame.copy()
+
+
+def open_source(spec, fps=None, realtime=True, loop=False, ring_size=SOURCE_RING_SIZE):
+    # "0" / 0 -> camera, a directory -> images, "synthetic[:seed]" -> generated
+    # scenes, anything else -> a video file
+    kwargs = {"fps": fps, "realtime": realtime, "ring_size": ring_size}
+    if isinstance(spec, int) or str(spec).isdigit():
+        return CameraSource(int(spec), **kwargs)
+    spec = str(spec)
+    if spec == "synthetic" or spec.startswith("synthetic:"):
+        seed = int(spec.partition(":")[2] or 0)
+        return SyntheticSource(seed=seed, loops=None if loop else 1, **{**kwargs, "fps": fps or 30.0})
+    if os.path.isdir(spec):
+        return ImageDirSource(spec, loop=loop, **kwargs)
+    return VideoSource(spec, loop=loop, **kwargs)
@@ -0,0 +1,138 @@
+import json
+import threading
+from collections import deque
+
+import numpy as np
+
+from config import CARD_IDS, STATE_SYNC_HISTORY, SUITS
+from renderer import progress_status, render_card, render_card_sum, render_progress, render_suit_title
+
+
+class StateSync:
+    # Turns the engine's CardTracker into a stream of small deltas. Each
+    # publish() compares the tracker's quantized card state with the last
+    # published one and records only what moved:
+    #
+    #   appeared  cards that started glowing
+    #   fading    glowing cards whose level or pop changed
+    #   expired   cards that stopped glowing (now shown as seen)
+    #   seen      cards detected for the first time
+    #
+    # plus the suit counts, progress status and cards-in-frame when those
+    # changed. message() renders a delta into per-card HTML fragments for
+    # one card style; the browser swaps those into the panels by their
+    # data-card attribute, so a frame where one card changed costs one
+    # fragment instead of all 52.
+
+    STYLES = ("icons", "images")
+
+    def __init__(self, history=STATE_SYNC_HISTORY):
+        n = len(CARD_IDS)
+        self.seq = 0
+        self._levels = np.zeros(n, np.int8)
+        self._pops = np.zeros(n, bool)
+        self._seen = np.zeros(n, bool)
+        self._ever = 0
+        self._status = progress_status()
+        self._in_frame = ()
+        self._deltas = deque(maxlen=history)
+        self._cond = threading.Condition()
+
+    def publish(self, cards, current_detections, is_running=True):
+        levels, pops, seen = cards.levels, cards.pops, cards.seen
+        moved = (levels != self._levels) | (pops != self._pops) | (seen != self._seen)
+        status = progress_status(cards, is_running)
+        in_frame = tuple(sorted(current_detections))
+        new_ever = cards.ever & ~self._ever
+        if not moved.any() and status == self._status and in_frame == self._in_frame and not new_ever:
+            return None
+
+        glowing, was_glowing = levels > 0, self._levels > 0
+        ids = np.flatnonzero(moved)
+        delta = {
+            "appeared": [CARD_IDS[i] for i in np.flatnonzero(glowing & ~was_glowing)],
+            "fading": [CARD_IDS[i] for i in np.flatnonzero(glowing & was_glowing & moved)],
+            "expired": [CARD_IDS[i] for i in np.flatnonzero(~glowing & was_glowing)],
+            "seen": [card_id for i, card_id in enumerate(CARD_IDS) if new_ever >> i & 1],
+            "state": {CARD_IDS[i]: (int(levels[i]), bool(pops[i]), bool(seen[i])) for i in ids},
+        }
+        if new_ever:
+            delta["suits"] = {s: cards.seen_count(s) for s in {c[-1] for c in delta["seen"]}}
+        if new_ever or status != self._status:
+            delta["progress"] = (cards.seen_count(), status)
+        if in_frame != self._in_frame:
+            delta["in_frame"] = in_frame
+
+        with self._cond:
+            self._levels, self._pops, self._seen = levels.copy(), pops.copy(), seen.copy()
+            self._ever, self._status, self._in_frame = cards.ever, status, in_frame
+            self.seq += 1
+            self._deltas.append((self.seq, delta, {}))
+            self._cond.notify_all()
+        return delta
+
+    def snapshot(self):
+        # (seq, delta that sets every card), for a client that just connected
+        with self._cond:
+            state = {card_id: (int(self._levels[i]), bool(self._pops[i]), bool(self._seen[i]))
+                     for i, card_id in enumerate(CARD_IDS)}
+            ever = self._ever
+            count = bin(ever).count("1")
+            suits = {s: sum(ever >> i & 1 for i, c in enumerate(CARD_IDS) if c[-1] == s) for s in SUITS}
+            return self.seq, {"state": state, "suits": suits, "progress": (count, self._status),
+                              "in_frame": self._in_frame, "reset": True}
+
+    def wait(self, last_seq, timeout=1.0):
+        # Deltas newer than last_seq as [(seq, delta, cache)], [] on timeout,
+        # or None when the client fell behind the kept history
+        with self._cond:
+            if self.seq == last_seq:
+                self._cond.wait(timeout)
+            if self.seq == last_seq:
+                return []
+            if not self._deltas or self._deltas[0][0] > last_seq + 1:
+                return None
+            return [entry for entry in self._deltas if entry[0] > last_seq]
+
+    def message(self, seq, delta, style_name, cache=None):
+        # One server-sent event, rendered once per style and reused by
+        # every client on that style
+        if cache is not None and style_name in cache:
+            return cache[style_name]
+        payload = {"seq": seq, **{k: delta[k] for k in ("appeared", "fading", "expired", "seen", "reset")
+                                  if k in delta}}
+        payload["cards"] = {card_id: render_card(style_name, card_id, *state)
+                            for card_id, state in delta["state"].items()}
+        if "suits" in delta:
+            payload["titles"] = {s: render_suit_title(s, n) for s, n in delta["suits"].items()}
+        if "progress" in delta:
+            payload["progress"] = render_progress(*delta["progress"])
+        if "in_frame" in delta:
+            payload["sum"] = render_card_sum(dict.fromkeys(delta["in_frame"]))
+        event = f"id: {seq}\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n".encode()
+        if cache is not None:
+            cache[style_name] = event
+        return event
+
+
+def client_html(events_url):
+    # Invisible component: listens on the events endpoint and patches the
+    # page the panels live in (the component iframe is same-origin)
+    return f'''
+<script>
+(() => {{
+  const doc = window.parent.document;
+  const swap = (selector, html) => {{
+    doc.querySelectorAll(selector).forEach((el) => {{ el.outerHTML = html; }});
+  }};
+  const source = new EventSource({json.dumps(events_url)});
+  source.onmessage = (event) => {{
+    const delta = JSON.parse(event.data);
+    for (const [card, html] of Object.entries(delta.cards || {{}})) swap(`[data-card="${{card}}"]`, html);
+    for (const [suit, html] of Object.entries(delta.titles || {{}})) swap(`[data-suit="${{suit}}"]`, html);
+    if (delta.progress) swap('[data-sync="progress"]', delta.progress);
+    if (delta.sum) swap('[data-sync="sum"]', delta.sum);
+  }};
+  window.addEventListener("unload", () => source.close());
+}})();
+</script>'''
@@ -1,3 +1,5 @@
+from config import GLOW_LEVELS, SUITS
+
 CSS_COMMON = """
 <style>
 @keyframes card-pop {
@@ -48,26 +50,63 @@ CSS_IMAGES = """
     position: relative;
     overflow: hidden;
 }
-.card img {
+.card .art {
     width: 100%; height: 100%;
-    object-fit: contain;
+    background-size: 1300% 400%;
+    background-repeat: no-repeat;
     border-radius: 4px;
 }
-.card.dim img {
+.card.dim .art {
     filter: brightness(0.15) saturate(0);
 }
-.card.dim-red img {
+.card.dim-red .art {
     filter: brightness(0.18) saturate(0.4) sepia(0.3) hue-rotate(-10deg);
 }
-.card.seen img {
+.card.seen .art {
     filter: brightness(0.5) saturate(0.3);
 }
-.card.seen-red img {
+.card.seen-red .art {
     filter: brightness(0.45) saturate(0.5) sepia(0.2) hue-rotate(-10deg);
 }
 </style>
 """
 
+def _hex_alpha(a):
+    return format(max(0, min(255, int(a * 255))), "02x")
+
+
+def _glow_rules(suit_key, glow_color, level):
+    intensity = level / GLOW_LEVELS
+    r1 = int(6 + 10 * intensity)
+    r2 = int(12 + 20 * intensity)
+    alpha = round(intensity, 2)
+
+    name = f"glow-{suit_key}-{level}"
+    lo1, lo2 = int(r1 * 0.6), int(r2 * 0.6)
+    hi1, hi2 = r1, r2
+
+    return (
+        f"@keyframes {name} {{"
+        f" 0%,100% {{ box-shadow: 0 0 {lo1}px {glow_color}{_hex_alpha(alpha)}, "
+        f"0 0 {lo2}px {glow_color}{_hex_alpha(alpha * 0.5)}; }}"
+        f" 50% {{ box-shadow: 0 0 {hi1}px {glow_color}{_hex_alpha(alpha)}, "
+        f"0 0 {hi2}px {glow_color}{_hex_alpha(alpha * 0.7)}; }}"
+        f"}}\n"
+        f".card.{name} {{ border-color: {glow_color}; color: rgba(255,255,255,{alpha}); "
+        f"background: #1a1a3e; animation: {name} 1.8s ease-in-out infinite; }}\n"
+        f".card.{name}.pop {{ animation: {name} 1.8s ease-in-out infinite, card-pop 0.35s ease-out; }}\n"
+        f".card.{name} .suit {{ opacity: {alpha}; }}\n"
+    )
+
+
+# Every glow level for every suit, emitted once per page. Card fragments only
+# pick a class (glow-<suit>-<level>), so the browser reuses these animations.
+CSS_GLOW = "<style>\n" + "".join(
+    _glow_rules(suit_key, info["glow"], level)
+    for suit_key, info in SUITS.items()
+    for level in range(1, GLOW_LEVELS + 1)
+) + "</style>\n"
+
 PAGE_CSS = """
 <style>
 #MainMenu, footer, header { visibility: hidden; }
@@ -166,6 +205,23 @@ button[kind="primary"]:hover,
     height: 100%;
     object-fit: contain;
 }
+.preview-box {
+    position: absolute;
+    border: 2px solid;
+    border-radius: 3px;
+    pointer-events: none;
+}
+.preview-box span {
+    position: absolute;
+    bottom: 100%;
+    left: -2px;
+    padding: 0 4px;
+    border-radius: 3px 3px 0 0;
+    color: #fff;
+    font-size: 11px;
+    font-weight: 600;
+    white-space: nowrap;
+}
 </style>
 """
 
@@ -0,0 +1,80 @@
+import os
+
+import cv2
+import numpy as np
+
+from config import CARDS_DIR, RANK_TO_FILENAME, SUIT_TO_FILENAME
+
+_card_cache = {}
+
+
+def card_files():
+    # card_id -> PNG path for every card present in assets/cards
+    files = {}
+    for rank_key, rank_name in RANK_TO_FILENAME.items():
+        for suit_key, suit_name in SUIT_TO_FILENAME.items():
+            filepath = os.path.join(CARDS_DIR, f"{rank_name}_of_{suit_name}.png")
+            if os.path.exists(filepath):
+                files[f"{rank_key}{suit_key}"] = filepath
+    return files
+
+
+def _load_card(card_id, filepath):
+    # BGRA, cached; the PNGs are ~500x726 so they are read once per process
+    if card_id not in _card_cache:
+        img = cv2.imread(filepath, cv2.IMREAD_UNCHANGED)
+        if img.ndim == 2:
+            img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGRA)
+        elif img.shape[2] == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2BGRA)
+        _card_cache[card_id] = img
+    return _card_cache[card_id]
+
+
+def make_background(rng, width=640, height=480):
+    # Felt-like table: a random dark colour, a soft vertical gradient and noise
+    base = rng.integers(20, 90, 3).astype(np.float32)
+    ramp = np.linspace(0.8, 1.2, height, dtype=np.float32)[:, None, None]
+    noise = rng.normal(0, 6, (height, width, 3)).astype(np.float32)
+    return np.clip(base * ramp + noise, 0, 255).astype(np.uint8)
+
+
+def paste_card(frame, card, rng, scale=(0.18, 0.35), max_angle=25):
+    # Alpha-blends card at a random pose; returns its (x1, y1, x2, y2) box
+    h, w = frame.shape[:2]
+    ch, cw = card.shape[:2]
+    s = rng.uniform(*scale) * h / ch
+    angle = rng.uniform(-max_angle, max_angle)
+    cx = rng.uniform(0.2, 0.8) * w
+    cy = rng.uniform(0.25, 0.75) * h
+
+    m = cv2.getRotationMatrix2D((cw / 2, ch / 2), angle, s)
+    m[:, 2] += (cx - cw / 2, cy - ch / 2)
+    warped = cv2.warpAffine(card, m, (w, h), flags=cv2.INTER_LINEAR,
+                            borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0, 0))
+    alpha = warped[:, :, 3:4].astype(np.float32) / 255.0
+    frame[:] = (warped[:, :, :3] * alpha + frame * (1.0 - alpha)).astype(np.uint8)
+
+    corners = np.array([[0, 0, 1], [cw, 0, 1], [cw, ch, 1], [0, ch, 1]], np.float32) @ m.T
+    x1, y1 = np.clip(corners.min(axis=0), 0, (w, h)).astype(int)
+    x2, y2 = np.clip(corners.max(axis=0), 0, (w, h)).astype(int)
+    return int(x1), int(y1), int(x2), int(y2)
+
+
+def make_scene(rng, n_cards=None, width=640, height=480, cards=None):
+    # Returns (frame_bgr, [(card_id, box), ...]) for a repeatable random scene
+    files = card_files()
+    if n_cards is None:
+        n_cards = int(rng.integers(1, 5))
+    ids = cards or [str(c) for c in rng.choice(sorted(files), size=min(n_cards, len(files)), replace=False)]
+    frame = make_background(rng, width, height)
+    truth = []
+    for card_id in ids:
+        box = paste_card(frame, _load_card(card_id, files[card_id]), rng)
+        truth.append((card_id, box))
+    return frame, truth
+
+
+def make_scenes(count, seed=0, **kwargs):
+    rng = np.random.default_rng(seed)
+    return [make_scene(rng, **kwargs) for _ in range(count)]
@@ -0,0 +1,25 @@
+import importlib.util
+import os
+
+import pytest
+
+from backends import BACKENDS, check_parity
+from config import MODEL_PATH
+
+# Exported backends must find the same cards as PyTorch. onnx-int8 is
+# approximate by design; quantize.py reports its agreement instead.
+EXPORTED = [name for name, (fmt, _) in BACKENDS.items() if fmt]
+
+
+@pytest.mark.parametrize("backend", EXPORTED)
+def test_backend_matches_pytorch(backend):
+    for module in ("ultralytics", "torch", BACKENDS[backend][1]):
+        if not importlib.util.find_spec(module):
+            pytest.skip(f"{module} is not installed")
+    if not os.path.exists(MODEL_PATH):
+        pytest.skip(f"{MODEL_PATH} is missing")
+    from synthetic import make_scenes
+
+    frames = [frame for frame, _ in make_scenes(10)]
+    result = check_parity(backend, frames)
+    assert result["ok"], result
@@ -0,0 +1,130 @@
+import cv2
+import numpy as np
+
+from config import (
+    DETECT_EVERY_N, TRACK_CONF_SMOOTHING, TRACK_IOU, TRACK_MAX_MISSES, TRACK_MIN_QUALITY,
+)
+from postprocess import Detections, box_iou
+
+# Points sampled inside each box for optical flow, as fractions of its size
+_GRID = np.array([(fx, fy) for fy in (0.25, 0.5, 0.75) for fx in (0.25, 0.5, 0.75)], np.float32)
+
+
+class _Track:
+    __slots__ = ("box", "cls", "conf", "misses")
+
+    def __init__(self, box, cls, conf):
+        self.box = box.astype(np.float32)
+        self.cls = cls
+        self.conf = conf
+        self.misses = 0
+
+
+class BoxTracker:
+    # Carries detections between model runs. update() takes real detections
+    # and associates them with existing tracks by class + IoU; track() moves
+    # every box by the median sparse optical flow of points inside it.
+    #
+    # A track survives max_misses detection rounds without a match and its
+    # confidence is smoothed, so a single missed detection no longer makes
+    # a card flip between popping and fading.
+
+    def __init__(self, detect_every=DETECT_EVERY_N, iou_threshold=TRACK_IOU,
+                 max_misses=TRACK_MAX_MISSES, min_quality=TRACK_MIN_QUALITY,
+                 conf_smoothing=TRACK_CONF_SMOOTHING):
+        self.detect_every = max(1, detect_every)
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.min_quality = min_quality
+        self.conf_smoothing = conf_smoothing
+        self.tracks = []
+        self.names = {}
+        self.quality = 1.0
+        self._prev_gray = None
+        self._since_detect = 0
+
+    def needs_detection(self):
+        return (
+            self._prev_gray is None
+            or self._since_detect + 1 >= self.detect_every
+            or self.quality < self.min_quality
+        )
+
+    def update(self, frame, detections):
+        self.names = detections.names
+        boxes = [t.box for t in self.tracks]
+        unmatched_dets = set(range(len(detections)))
+
+        if self.tracks and len(detections):
+            iou = box_iou(np.array(boxes), detections.xyxy)
+            track_cls = np.array([t.cls for t in self.tracks])
+            iou[track_cls[:, None] != detections.cls[None]] = 0
+            matched_tracks = set()
+            for flat in np.argsort(-iou, axis=None):
+                i, j = divmod(int(flat), len(detections))
+                if iou[i, j] < self.iou_threshold:
+                    break
+                if i in matched_tracks or j not in unmatched_dets:
+                    continue
+                track = self.tracks[i]
+                track.box = detections.xyxy[j].astype(np.float32)
+                track.conf = (self.conf_smoothing * track.conf
+                              + (1 - self.conf_smoothing) * float(detections.conf[j]))
+                track.misses = 0
+                matched_tracks.add(i)
+                unmatched_dets.discard(j)
+            for i, track in enumerate(self.tracks):
+                if i not in matched_tracks:
+                    track.misses += 1
+        else:
+            for track in self.tracks:
+                track.misses += 1
+
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+        for j in sorted(unmatched_dets):
+            self.tracks.append(_Track(detections.xyxy[j], int(detections.cls[j]), float(detections.conf[j])))
+
+        self._prev_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        self._since_detect = 0
+        self.quality = 1.0
+        return self.detections(frame.shape)
+
+    def track(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        self._since_detect += 1
+        if not self.tracks or self._prev_gray is None:
+            self._prev_gray = gray
+            return self.detections(frame.shape)
+
+        boxes = np.array([t.box for t in self.tracks])
+        size = boxes[:, 2:] - boxes[:, :2]
+        points = (boxes[:, None, :2] + _GRID[None] * size[:, None]).reshape(-1, 1, 2)
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(
+            self._prev_gray, gray, points.astype(np.float32), None, winSize=(15, 15), maxLevel=2)
+        status = status.reshape(len(self.tracks), len(_GRID)).astype(bool)
+        flow = (moved - points).reshape(len(self.tracks), len(_GRID), 2)
+
+        qualities = []
+        for track, ok, delta in zip(self.tracks, status, flow):
+            good = int(ok.sum())
+            qualities.append(good / len(_GRID))
+            if good >= 3:
+                dx, dy = np.median(delta[ok], axis=0)
+                track.box += (dx, dy, dx, dy)
+        self.quality = min(qualities)
+        self._prev_gray = gray
+        return self.detections(frame.shape)
+
+    def detections(self, shape=None):
+        if not self.tracks:
+            return Detections.empty(self.names)
+        xyxy = np.array([t.box for t in self.tracks])
+        if shape is not None:
+            xyxy[:, 0::2] = np.clip(xyxy[:, 0::2], 0, shape[1] - 1)
+            xyxy[:, 1::2] = np.clip(xyxy[:, 1::2], 0, shape[0] - 1)
+        return Detections(
+            xyxy.round().astype(np.int32),
+            np.array([t.conf for t in self.tracks], np.float32),
+            np.array([t.cls for t in self.tracks], np.int64),
+            self.names,
+        )
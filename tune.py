@@ -0,0 +1,160 @@
+import argparse
+import json
+import os
+import platform
+import time
+
+import numpy as np
+
+from backends import BACKENDS, available_backends, load_backend, warm_up
+from config import (
+    INFER_CONF, INFER_IMGSZ, MODEL_PATH, RUNTIME_PROFILE_PATH, TUNE_IMGSZ, TUNE_MIN_AGREEMENT,
+)
+from postprocess import Detections, agreement
+from synthetic import make_scenes
+
+
+def thread_options():
+    # 1, 2, 4, ... up to the number of cores, plus the core count itself
+    cores = os.cpu_count() or 1
+    options, n = [], 1
+    while n < cores:
+        options.append(n)
+        n *= 2
+    return options + [cores]
+
+
+def candidates(backends, imgsz_list, threads, half_ok):
+    # (backend, imgsz, threads, fuse, half). Threads, fusion and half only
+    # mean something for PyTorch; exported runtimes manage their own.
+    for backend in backends:
+        for imgsz in imgsz_list:
+            if backend != "pytorch":
+                yield backend, imgsz, None, False, False
+                continue
+            for n in threads:
+                for fuse in (False, True):
+                    for half in ((False, True) if half_ok else (False,)):
+                        yield backend, imgsz, n, fuse, half
+
+
+def run(model, frames, imgsz, half=False, conf=INFER_CONF):
+    # Single-frame calls like the live loop; returns (median ms, detections)
+    kwargs = {"imgsz": imgsz, "conf": conf, "verbose": False}
+    if half:
+        kwargs["half"] = True
+    warm_up(model, imgsz)
+    times, outputs = [], []
+    for frame in frames:
+        start = time.perf_counter()
+        result = model(frame, **kwargs)[0]
+        times.append(time.perf_counter() - start)
+        outputs.append(Detections.from_result(result))
+    return float(np.median(times) * 1000), outputs
+
+
+def score(reference, outputs):
+    # recall: share of reference boxes reproduced; precision: share of the
+    # candidate's boxes that match one
+    totals = {"reference": 0, "other": 0, "matched": 0}
+    for ref, out in zip(reference, outputs):
+        result = agreement(ref, out)
+        for key in totals:
+            totals[key] += result[key]
+    return {
+        "recall": totals["matched"] / totals["reference"] if totals["reference"] else 1.0,
+        "precision": totals["matched"] / totals["other"] if totals["other"] else 1.0,
+    }
+
+
+def tune(backends=None, imgsz_list=TUNE_IMGSZ, threads=None, frames=60, min_agreement=TUNE_MIN_AGREEMENT,
+         model_path=MODEL_PATH, seed=0, log=print):
+    # Reference: PyTorch with library defaults at INFER_IMGSZ, what an
+    # untuned deployment runs
+    import torch
+
+    backends = [b for b in (backends or available_backends()) if b in available_backends()]
+    threads = threads or thread_options()
+    half_ok = torch.cuda.is_available()
+    scenes = [frame for frame, _ in make_scenes(frames, seed=seed)]
+    default_threads = torch.get_num_threads()
+
+    reference_ms, reference = run(load_backend("pytorch", model_path, profile_path=None), scenes, INFER_IMGSZ)
+    log(f"reference pytorch imgsz={INFER_IMGSZ} threads={default_threads}: {reference_ms:.1f} ms")
+
+    rows, models = [], {}
+    for backend, imgsz, n, fuse, half in candidates(backends, imgsz_list, threads, half_ok):
+        key = (backend, fuse)
+        if key not in models:
+            try:
+                models[key] = load_backend(backend, model_path, profile_path=None)
+            except (ImportError, FileNotFoundError) as e:
+                log(f"skipping {backend}: {e}")
+                models[key] = None
+            if models[key] is not None and fuse:
+                models[key].fuse()
+        model = models[key]
+        if model is None:
+            continue
+
+        torch.set_num_threads(n or default_threads)
+        ms, outputs = run(model, scenes, imgsz, half)
+        row = {"backend": backend, "imgsz": imgsz, "threads": n, "fuse": fuse, "half": half,
+               "ms_per_frame": ms, **score(reference, outputs)}
+        row["ok"] = min(row["recall"], row["precision"]) >= min_agreement
+        rows.append(row)
+        log(f"{backend:<9} imgsz={imgsz:<4} threads={str(n):<3} fuse={fuse!s:<5} half={half!s:<5} "
+            f"{ms:7.1f} ms  recall {row['recall']:.1%}  precision {row['precision']:.1%}"
+            + ("" if row["ok"] else "  (rejected)"))
+    torch.set_num_threads(default_threads)
+
+    accepted = [row for row in rows if row["ok"]]
+    best = min(accepted, key=lambda row: row["ms_per_frame"]) if accepted else None
+    return best, reference_ms, rows
+
+
+def write_profile(best, reference_ms, path=RUNTIME_PROFILE_PATH, model_path=MODEL_PATH, frames=None):
+    profile = {
+        **{key: best[key] for key in ("backend", "imgsz", "threads", "fuse", "half")},
+        "ms_per_frame": round(best["ms_per_frame"], 2),
+        "reference_ms_per_frame": round(reference_ms, 2),
+        "recall": round(best["recall"], 4),
+        "precision": round(best["precision"], 4),
+        "frames": frames,
+        "machine": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "model_mtime": os.path.getmtime(model_path),
+    }
+    with open(path, "w") as f:
+        json.dump(profile, f, indent=2)
+    return profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the fastest inference settings for this machine.")
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS),
+                        help="backends to try (default: every one that can run here)")
+    parser.add_argument("--imgsz", nargs="+", type=int, default=list(TUNE_IMGSZ))
+    parser.add_argument("--threads", nargs="+", type=int, help="torch thread counts (default: 1, 2, 4, ... cores)")
+    parser.add_argument("--frames", type=int, default=60, help="synthetic frames per candidate (default: 60)")
+    parser.add_argument("--min-agreement", type=float, default=TUNE_MIN_AGREEMENT,
+                        help=f"minimum recall and precision vs. the reference (default: {TUNE_MIN_AGREEMENT})")
+    parser.add_argument("--out", default=RUNTIME_PROFILE_PATH)
+    parser.add_argument("--dry-run", action="store_true", help="report only; don't write the profile")
+    args = parser.parse_args()
+
+    best, reference_ms, rows = tune(args.backends, args.imgsz, args.threads, args.frames, args.min_agreement)
+    if best is None:
+        print(f"No candidate reached {args.min_agreement:.0%} agreement; keeping library defaults")
+        return
+    print(f"Fastest acceptable: {best['backend']} imgsz={best['imgsz']} threads={best['threads']} "
+          f"fuse={best['fuse']} half={best['half']}: {best['ms_per_frame']:.1f} ms "
+          f"({reference_ms / best['ms_per_frame']:.1f}x the reference)")
+    if not args.dry_run:
+        write_profile(best, reference_ms, args.out, frames=args.frames)
+        print(f"Wrote {args.out}; load_backend() applies it from now on")
+
+
+if __name__ == "__main__":
+    main()